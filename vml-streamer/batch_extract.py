@@ -0,0 +1,203 @@
+import os, sys, json, time, argparse, math
+import cv2, numpy as np, mediapipe as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from mediapipe.tasks import python as tasks
+from mediapipe.tasks.python import vision
+from stream_engine import DETECTORS
+from sequence_reader import find_sequence_files, read_image, is_sequence_path
+import stream_types as st
+import stream_config
+
+#---------------------------------------------------------#
+# Offline landmark extraction: runs the MediaPipe detectors
+# in VIDEO mode on every frame of a video file or image
+# sequence, split in chunks across a process pool.
+#
+#   python batch_extract.py take.mp4 take_landmarks --types hands face
+#
+# Output folder (load in Houdini with np.load(path, mmap_mode='r')):
+#   meta.json              source info, per type file names and person slots
+#   <type>.npy             float32 (frames, people, joints, 3), NaN = not detected
+#   <type>_confidence.npy  float32 (frames, people)
+#---------------------------------------------------------#
+
+STREAM_TYPE_NAMES = {
+	'hands': st.ST_MP_HANDS,
+	'body':  st.ST_MP_BODY,
+	'face':  st.ST_MP_FACE,
+}
+
+# joints per detector (people slots per performer: see person_slots)
+DETECTOR_JOINTS = {
+	st.ST_MP_HANDS: 21,
+	st.ST_MP_BODY:  33,
+	st.ST_MP_FACE:  478,
+}
+
+# person slots in the output arrays, by person name (persistent ids, see person_tracker.py)
+def person_slots(stype, performers):
+	if stype==st.ST_MP_HANDS: return ['Left', 'Right'] + [f'{hand}{i}' for i in range(1, performers) for hand in ('Left', 'Right')]
+	prefix = 'Body' if stype==st.ST_MP_BODY else 'Face'
+	return [f'{prefix}{i}' for i in range(performers)]
+
+# source frame count, fps and size
+def probe_source(source):
+	if is_sequence_path(source):
+		files = find_sequence_files(source)
+		frame = read_image(files[0]) if files else None
+		if frame is None: raise ValueError(f'Could not read image sequence: {source}')
+		return {'type': 'sequence', 'frames': len(files), 'fps': 24.0, 'width': frame.shape[1], 'height': frame.shape[0]}
+
+	capture = cv2.VideoCapture(source)
+	if not capture.isOpened(): raise ValueError(f'Could not open video: {source}')
+	info = {
+		'type':   'video',
+		'frames': int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+		'fps':    capture.get(cv2.CAP_PROP_FPS) or 24.0,
+		'width':  int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+		'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+	}
+	capture.release()
+	return info
+
+# yields (frame index, BGR frame) from start, sequentially
+def iter_frames(source, source_type, start, end):
+	if source_type=='sequence':
+		for index, path in enumerate(find_sequence_files(source)[start:end], start):
+			frame = read_image(path)
+			if frame is None: return
+			yield index, frame
+	else:
+		capture = cv2.VideoCapture(source)
+		capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+		for index in range(start, end):
+			grabbed, frame = capture.read()
+			if not grabbed: break
+			yield index, frame
+		capture.release()
+
+# process pool worker: detect frames [start, end) after warming up trackers / filters on the previous frames
+def extract_chunk(job):
+	stypes = job['stypes']
+	start, end = job['start'], job['end']
+	first = max(0, start-job['warmup'])
+	width, height = job['width'], job['height']
+	delegate = tasks.BaseOptions.Delegate.GPU if job['gpu'] else tasks.BaseOptions.Delegate.CPU
+
+	detectors = {}
+	outputs = {}
+	for stype in stypes:
+		detector = DETECTORS[stype](width, height, running_mode=vision.RunningMode.VIDEO, delegate=delegate, max_people=len(job['slots'][stype]))
+		detector.draw_skeleton = False
+		detector.apply_filter = job['filter']
+		detector.one_euro_beta = job['beta']
+		detectors[stype] = detector
+		outputs[stype] = (
+			np.load(job['files'][stype], mmap_mode='r+'),
+			np.load(job['confidence_files'][stype], mmap_mode='r+'),
+			{name: slot for slot, name in enumerate(job['slots'][stype])},
+		)
+
+	done = 0
+	for index, frame in iter_frames(job['source'], job['source_type'], first, end):
+		if job['flip']: frame = cv2.flip(frame, 1)
+		if frame.shape[1]!=width or frame.shape[0]!=height: frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+		image = mp.Image(mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+		timestamp = int(round(index*1000/job['fps']))
+
+		for stype, detector in detectors.items():
+			detector.image = image
+			detector.detect(timestamp)
+			if index < start: continue  # warm-up frame
+
+			landmarks, confidence, slots = outputs[stype]
+			result = detector.result
+			for i, name in enumerate(result.names):
+				slot = slots.get(name)
+				if slot is None: continue
+				landmarks[index, slot] = result.landmarks[i]
+				confidence[index, slot] = result.confidence[i]
+
+		if index >= start: done += 1
+
+	for detector in detectors.values(): detector.close()
+	for landmarks, confidence, slots in outputs.values():
+		landmarks.flush()
+		confidence.flush()
+	return start, end, done
+
+def main():
+	parser = argparse.ArgumentParser(description='VML Streamer offline landmark extraction')
+	parser.add_argument('source', help='video file or image sequence (eg: plate.1001-1100#.exr)')
+	parser.add_argument('output', help='output folder')
+	parser.add_argument('--types', nargs='+', choices=STREAM_TYPE_NAMES.keys(), default=['hands'], help='detectors to run')
+	parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+	parser.add_argument('--chunk', type=int, default=0, help='frames per chunk (default: split evenly across workers)')
+	parser.add_argument('--warmup', type=int, default=15, help='frames processed before each chunk to warm up tracking and filters')
+	parser.add_argument('--people', type=int, default=1, help='performers to track (persistent ids, hands: two per performer)')
+	parser.add_argument('--size', type=float, default=1.0, help='video size multiplier')
+	parser.add_argument('--flip', action='store_true', help='flip video horizontal')
+	parser.add_argument('--filter', action='store_true', help='apply one-euro motion filter')
+	parser.add_argument('--smoothing', type=float, default=60, help='motion filter smoothing factor (0-100)')
+	parser.add_argument('--gpu', action='store_true', help='use GPU delegate (default: CPU, safer with many processes)')
+	args = parser.parse_args()
+
+	try: info = probe_source(args.source)
+	except ValueError as e:
+		print(e, file=sys.stderr)
+		return 1
+
+	frames = info['frames']
+	width, height = int(info['width']*args.size), int(info['height']*args.size)
+	os.makedirs(args.output, exist_ok=True)
+
+	# memory mapped outputs, every worker writes its own frame range
+	stypes = [STREAM_TYPE_NAMES[t] for t in args.types]
+	meta = {'source': os.path.abspath(args.source), 'frames': frames, 'fps': info['fps'], 'width': width, 'height': height, 'flip': args.flip, 'streams': {}}
+	files, confidence_files, slots = {}, {}, {}
+	for name in args.types:
+		stype = STREAM_TYPE_NAMES[name]
+		num_joints = DETECTOR_JOINTS[stype]
+		slots[stype] = person_slots(stype, max(1, args.people))
+		files[stype] = os.path.join(args.output, f'{name}.npy')
+		confidence_files[stype] = os.path.join(args.output, f'{name}_confidence.npy')
+		landmarks = np.lib.format.open_memmap(files[stype], mode='w+', dtype=np.float32, shape=(frames, len(slots[stype]), num_joints, 3))
+		landmarks[:] = np.nan
+		landmarks.flush()
+		confidence = np.lib.format.open_memmap(confidence_files[stype], mode='w+', dtype=np.float32, shape=(frames, len(slots[stype])))
+		confidence[:] = 0
+		confidence.flush()
+		del landmarks, confidence
+		meta['streams'][name] = {'type': stype, 'file': f'{name}.npy', 'confidence_file': f'{name}_confidence.npy', 'people': slots[stype]}
+	with open(os.path.join(args.output, 'meta.json'), 'w') as f: json.dump(meta, f, indent=4)
+
+	# split clip in chunks
+	chunk = args.chunk if args.chunk>0 else max(1, math.ceil(frames/max(1, args.workers)))
+	beta = stream_config.change_range(args.smoothing, 0, 100, 100, 0.5)
+	jobs = [
+		{
+			'source': args.source, 'source_type': info['type'], 'stypes': stypes,
+			'start': start, 'end': min(frames, start+chunk), 'warmup': args.warmup,
+			'fps': info['fps'], 'width': width, 'height': height, 'flip': args.flip, 'gpu': args.gpu,
+			'filter': args.filter, 'beta': beta,
+			'files': files, 'confidence_files': confidence_files, 'slots': slots,
+		}
+		for start in range(0, frames, chunk)
+	]
+
+	print(f'Extracting {", ".join(args.types)} from {frames} frames ({width}x{height}) in {len(jobs)} chunk(s) on {args.workers} worker(s)...')
+	start_time = time.time()
+	processed = 0
+	with ProcessPoolExecutor(max_workers=args.workers) as pool:
+		for future in as_completed([pool.submit(extract_chunk, job) for job in jobs]):
+			start, end, done = future.result()
+			processed += done
+			print(f'  frames {start}-{end-1} done ({processed}/{frames})')
+
+	elapsed = time.time() - start_time
+	duration = frames/info['fps'] if info['fps'] else 0
+	print(f'Done in {elapsed:.1f}s ({processed/max(elapsed, 1e-6):.1f} fps, {duration/max(elapsed, 1e-6):.1f}x realtime) -> {args.output}')
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,275 @@
+import os, sys, json, time, socket, selectors, threading, argparse, resource
+import cv2, numpy as np
+from mediapipe.tasks import python as tasks
+from stream_engine import StreamEngine
+from detector_pool import DetectorProcess
+from sequence_reader import is_sequence_path, find_sequence_files, read_image
+import stream_types as st
+import stream_config
+import landmark_packet
+import video_protocol
+
+#---------------------------------------------------------#
+# Benchmark: runs the stream pipeline on synthetic (or
+# pre-recorded) frames against loopback udp receivers,
+# with the CPU delegate (no camera / GPU needed).
+#
+#   python benchmark.py
+#   python benchmark.py --input take.mp4 --sizes 1280x720 --configs hands all --json results.json
+#
+# Reports per configuration: throughput (frames/s), capture
+# to receive latency per stream, bytes on the wire, cpu
+# usage and memory (RSS).
+#---------------------------------------------------------#
+
+# stream types per benchmark configuration
+CONFIGS = {
+	'video': [st.ST_VIDEO],
+	'info':  [st.ST_INFO_DICT],
+	'hands': [st.ST_MP_HANDS],
+	'body':  [st.ST_MP_BODY],
+	'face':  [st.ST_MP_FACE],
+	'all':   [st.ST_VIDEO, st.ST_INFO_DICT, st.ST_MP_HANDS, st.ST_MP_BODY, st.ST_MP_FACE],
+}
+
+#---------------------------------------------------------#
+# VideoStream compatible source, cycles through frames
+# kept in memory (no decoding cost in the measurements)
+#---------------------------------------------------------#
+class SyntheticStream:
+
+	def __init__(self, frames, fps=0):
+		self.source_frames = frames
+		self.height, self.width = frames[0].shape[:2]
+		self.source_type = 'synthetic'
+		self.source_file = None
+		self.frames = 0
+		self.frameNumber = 0
+		self.source_fps = fps
+		self.fps = fps
+		self.frame_id = 0
+		self.frame_time = time.time()
+
+	def has_frames(self):
+		return False
+
+	def isOpened(self):
+		return True
+
+	def info(self):
+		return ''
+
+	# next frame, stamped with the current time (like a capture)
+	def read(self):
+		frame = self.source_frames[self.frame_id % len(self.source_frames)]
+		self.frame_id += 1
+		self.frame_time = time.time()
+		return True, frame
+
+	def stop(self):
+		pass
+
+# moving gradient with a few shapes, enough texture for jpeg / detectors to do real work
+def synthetic_frames(width, height, count=60):
+	y, x = np.mgrid[0:height, 0:width]
+	rng = np.random.default_rng(0)
+	frames = []
+	for i in range(count):
+		frame = np.empty((height, width, 3), dtype=np.uint8)
+		frame[..., 0] = (x + i*8) % 256
+		frame[..., 1] = (y + i*4) % 256
+		frame[..., 2] = ((x + y)//2 + i*2) % 256
+		cx, cy = int(width*(0.5 + 0.3*np.sin(i/count*2*np.pi))), height//2
+		cv2.circle(frame, (cx, cy), height//6, (40, 160, 220), -1)
+		cv2.rectangle(frame, (width//8, height//8), (width//8 + height//5, height//8 + height//5), (220, 220, 220), -1)
+		frame = cv2.add(frame, rng.integers(0, 16, frame.shape, dtype=np.uint8))
+		frames.append(frame)
+	return frames
+
+# first frames of a video file / image sequence, resized
+def recorded_frames(path, width, height, count=300):
+	if is_sequence_path(path):
+		frames = [read_image(f) for f in find_sequence_files(path)[:count]]
+		frames = [f for f in frames if f is not None]
+	else:
+		capture = cv2.VideoCapture(path)
+		frames = []
+		while len(frames) < count:
+			grabbed, frame = capture.read()
+			if not grabbed: break
+			frames.append(frame)
+		capture.release()
+	if not frames: raise ValueError(f'Could not read frames from "{path}"')
+	return [cv2.resize(f, (width, height), interpolation=cv2.INTER_AREA) if f.shape[1::-1]!=(width, height) else f for f in frames]
+
+#---------------------------------------------------------#
+# loopback udp receivers (one socket per stream, single
+# thread): counts bytes / datagrams and measures capture
+# to receive latency from the packet timestamps
+#---------------------------------------------------------#
+class LoopbackReceivers:
+
+	def __init__(self, stypes):
+		self.selector = selectors.DefaultSelector()
+		self.streams = []
+		self.counters = {}
+		for stype in stypes:
+			skt = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			skt.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4*1024*1024)
+			skt.bind(('127.0.0.1', 0))
+			skt.setblocking(False)
+			self.streams.append({'type': stype, 'address': '127.0.0.1', 'port': skt.getsockname()[1]})
+			self.counters[stype] = {'bytes': 0, 'datagrams': 0, 'latency': [], 'frame_ids': set()}
+			self.selector.register(skt, selectors.EVENT_READ, stype)
+		self.stopped = False
+		self.t = threading.Thread(target=self.update, args=(), daemon=True)
+		self.t.start()
+
+	def update(self):
+		while not self.stopped:
+			for key, _ in self.selector.select(timeout=0.1):
+				while True:
+					try: data = key.fileobj.recv(65536)
+					except BlockingIOError: break
+					self.received(key.data, data, time.time())
+
+	def received(self, stype, data, now):
+		counters = self.counters[stype]
+		counters['bytes'] += len(data)
+		counters['datagrams'] += 1
+
+		# capture timestamp: last chunk of a video frame, binary landmark packets
+		timestamp, frame_id = None, None
+		if stype == st.ST_VIDEO:
+			parsed = video_protocol.parse_packet(data)
+			if parsed and parsed[1] == parsed[2]-1: frame_id, timestamp = parsed[0], parsed[3]
+		elif data[:4] == landmark_packet.MAGIC:
+			packet = landmark_packet.decode(data)
+			frame_id, timestamp = packet.frame_id, packet.timestamp
+		if timestamp: counters['latency'].append(now - timestamp)
+		if frame_id is not None: counters['frame_ids'].add(frame_id)
+
+	def stop(self):
+		self.stopped = True
+		self.t.join(timeout=1)
+		for key in list(self.selector.get_map().values()): key.fileobj.close()
+		self.selector.close()
+
+# current resident memory (MB), of this process plus pids (detector processes, linux only)
+def rss_mb(pids=()):
+	try:
+		total = 0
+		for pid in ['self', *pids]:
+			with open(f'/proc/{pid}/statm') as f: total += int(f.read().split()[1])
+		return total*os.sysconf('SC_PAGE_SIZE')/(1024*1024)
+	except (OSError, ValueError, AttributeError):
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+# process cpu time (all threads, seconds), plus the cpu time of pids (detector processes, linux only)
+def cpu_time(pids=()):
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+	total = usage.ru_utime + usage.ru_stime
+	for pid in pids:
+		try:
+			with open(f'/proc/{pid}/stat') as f: fields = f.read().rsplit(')', 1)[1].split()
+			total += (int(fields[11]) + int(fields[12]))/os.sysconf('SC_CLK_TCK')  # utime + stime, in clock ticks
+		except (OSError, ValueError, IndexError, AttributeError): pass
+	return total
+
+# pids of the engine's detector processes (--processes)
+def detector_pids(engine):
+	return [detector.process.pid for detector in engine.detectors.values() if isinstance(detector, DetectorProcess)]
+
+def percentile_ms(values, q):
+	return round(float(np.percentile(values, q))*1000, 2) if len(values) else None
+
+# run a single configuration, returns its report
+def run_config(name, frames, num_frames, warmup, fps, detector_processes, roi_tracking=False):
+	stypes = CONFIGS[name]
+	height, width = frames[0].shape[:2]
+	vs = SyntheticStream(frames, fps)
+	engine = StreamEngine(vs, draw_overlay=False, preview=False, detector_processes=detector_processes, delegate=tasks.BaseOptions.Delegate.CPU, roi_tracking=roi_tracking)
+	receivers = LoopbackReceivers(stypes)
+	streams = [stream_config.finalize_stream(dict(s)) for s in receivers.streams]
+
+	# warm up (detector creation, model loading, first inferences)
+	for _ in range(warmup):
+		engine.step(streams)
+		if fps: time.sleep(1/fps)
+	time.sleep(0.2)
+	for counters in receivers.counters.values(): counters.update({'bytes': 0, 'datagrams': 0, 'latency': [], 'frame_ids': set()})
+	engine.stats.reset()
+
+	pids = detector_pids(engine)  # created during warm up
+	cpu_start, wall_start = cpu_time(pids), time.perf_counter()
+	for i in range(num_frames):
+		engine.step(streams)
+		if fps: time.sleep(max(0, wall_start + (i+1)/fps - time.perf_counter()))
+	elapsed = time.perf_counter() - wall_start
+	cpu = cpu_time(pids) - cpu_start
+	time.sleep(0.2)  # let the last datagrams arrive
+
+	report = {
+		'config': name,
+		'size': f'{width}x{height}',
+		'frames': num_frames,
+		'fps': round(num_frames/elapsed, 2),
+		'cpu_percent': round(100*cpu/elapsed, 1),
+		'rss_mb': round(rss_mb(pids), 1),
+		'streams': {},
+		'stages': engine.stats.summary(),
+	}
+	for stype, counters in receivers.counters.items():
+		report['streams'][stype] = {
+			'mbit_per_s': round(counters['bytes']*8/elapsed/1e6, 3),
+			'datagrams': counters['datagrams'],
+			'frames_received': len(counters['frame_ids']),
+			'latency_p50_ms': percentile_ms(counters['latency'], 50),
+			'latency_p95_ms': percentile_ms(counters['latency'], 95),
+		}
+
+	engine.stop()
+	receivers.stop()
+	return report
+
+def print_report(report):
+	print(f'\n{report["config"]} @ {report["size"]}: {report["fps"]} fps, cpu {report["cpu_percent"]}%, rss {report["rss_mb"]} MB')
+	for stype, s in report['streams'].items():
+		latency = f'{s["latency_p50_ms"]} / {s["latency_p95_ms"]} ms' if s['latency_p50_ms'] is not None else '-'
+		print(f'  {stype:<18} {s["mbit_per_s"]:>9.3f} Mbit/s  {s["datagrams"]:>7} datagrams  {s["frames_received"]:>5} frames  latency p50/p95 {latency}')
+
+def main():
+	parser = argparse.ArgumentParser(description='VML Streamer benchmark (CPU delegate, loopback receivers)')
+	parser.add_argument('--sizes', nargs='+', default=['640x480', '1280x720'], help='frame sizes, WxH')
+	parser.add_argument('--configs', nargs='+', choices=CONFIGS.keys(), default=list(CONFIGS.keys()), help='stream configurations')
+	parser.add_argument('--frames', type=int, default=300, help='measured frames per configuration')
+	parser.add_argument('--warmup', type=int, default=30, help='frames before measuring')
+	parser.add_argument('--fps', type=float, default=0, help='pace frames like a camera (0 = as fast as possible)')
+	parser.add_argument('--input', help='video file or image sequence instead of synthetic frames')
+	parser.add_argument('--processes', action='store_true', help='run detectors in separate processes')
+	parser.add_argument('--roi', action='store_true', help='region of interest tracking (detectors see a crop around the people)')
+	parser.add_argument('--json', help='write all reports to a json file')
+	args = parser.parse_args()
+
+	reports = []
+	for size in args.sizes:
+		try: width, height = (int(v) for v in size.lower().split('x'))
+		except ValueError:
+			print(f'Invalid size "{size}", expected WxH', file=sys.stderr)
+			return 1
+		try: frames = recorded_frames(args.input, width, height) if args.input else synthetic_frames(width, height)
+		except ValueError as e:
+			print(e, file=sys.stderr)
+			return 1
+
+		for name in args.configs:
+			report = run_config(name, frames, args.frames, args.warmup, args.fps, args.processes, args.roi)
+			print_report(report)
+			reports.append(report)
+
+	if args.json:
+		with open(args.json, 'w') as f: json.dump({'time': time.time(), 'input': args.input or 'synthetic', 'reports': reports}, f, indent=4)
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,136 @@
+import threading, queue, multiprocessing as mproc
+from multiprocessing import shared_memory
+import numpy as np
+import landmark_packet
+import roi_tracker
+from result_slot import ResultSlot
+
+#---------------------------------------------------------#
+# shared memory ring of RGB frames: the engine publishes
+# each frame once, detector processes copy it out by
+# slot (no pickling of pixel data). Every slot has a
+# frame id, set to -1 while the slot is being written,
+# so readers can tell when a frame was overwritten.
+#---------------------------------------------------------#
+class FrameRing:
+
+	def __init__(self, shape, slots=8, name=None):
+		self.shape = tuple(shape)
+		self.slots = slots
+		frame_size = int(np.prod(self.shape))
+		self.owner = name is None
+		self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=slots*8 + slots*frame_size)
+		self.frame_ids = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf)
+		self.frames = np.ndarray((slots,)+self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slots*8)
+		if self.owner: self.frame_ids[:] = -1
+
+	@property
+	def name(self):
+		return self.shm.name
+
+	# write a frame, returns its slot
+	def publish(self, frame_id, frame):
+		slot = frame_id % self.slots
+		self.frame_ids[slot] = -1
+		self.frames[slot] = frame
+		self.frame_ids[slot] = frame_id
+		return slot
+
+	# copy of the frame in slot (or of a crop, see roi_tracker.crop), None if it was overwritten (detector fell behind)
+	def read(self, slot, frame_id, roi=None, max_size=0):
+		if self.frame_ids[slot] != frame_id: return None
+		frame = self.frames[slot].copy() if roi is None else roi_tracker.crop(self.frames[slot], roi, max_size)[0]
+		if self.frame_ids[slot] != frame_id: return None
+		return frame
+
+	def close(self):
+		self.frame_ids = None
+		self.frames = None
+		self.shm.close()
+		if self.owner: self.shm.unlink()
+
+# detector process main loop: always works on the newest requested frame, older requests are dropped
+def detector_worker(stype, width, height, delegate, max_people, options, requests, results):
+	import mediapipe as mp
+	from mediapipe.tasks.python import vision
+	from stream_engine import DETECTORS
+
+	# VIDEO mode: synchronous, results come back in order on this process
+	detector = DETECTORS[stype](width, height, running_mode=vision.RunningMode.VIDEO, delegate=delegate, max_people=max_people, **options)
+	detector.draw_skeleton = False
+	rings = {}
+
+	while True:
+		request = requests.get()
+		try:
+			while request is not None: request = requests.get_nowait()
+		except queue.Empty: pass
+		if request is None: break
+
+		ring_name, shape, slot, frame_id, timestamp, capture_time, roi, max_size, apply_filter, beta = request
+		if ring_name not in rings:
+			for ring in rings.values(): ring.close()
+			rings = {ring_name: FrameRing(shape, name=ring_name)}
+		frame = rings[ring_name].read(slot, frame_id, roi, max_size)
+		if frame is None: continue
+
+		detector.apply_filter = apply_filter
+		detector.one_euro_beta = beta
+		detector.image = mp.Image(mp.ImageFormat.SRGB, data=frame)
+		detector.detect(timestamp, capture_time, frame_id, roi_tracker.aligned_roi(roi, shape))
+		results.put((detector.result, detector.callback_time))
+
+	detector.close()
+	for ring in rings.values(): ring.close()
+
+#---------------------------------------------------------#
+# runs a MediaPipe_* detector in its own process, with the
+# same attributes the engine uses on in-process detectors
+# (result, results, apply_filter, one_euro_beta). Results
+# arrive on a background thread, like the LIVE_STREAM
+# callbacks. Skeleton overlays are not drawn (results have
+# no display_image).
+#---------------------------------------------------------#
+class DetectorProcess:
+
+	# max_people: max people (hands) the detector finds, options: extra detector arguments (face outputs)
+	def __init__(self, stype, width, height, delegate=None, max_people=1, **options):
+		self.stype = stype
+		self.__dict__.update(options)  # same option attributes as the detector (the engine compares them)
+		self.apply_filter = True
+		self.one_euro_beta = 20
+		self.draw_skeleton = False
+		self.max_people = max_people
+		self.results = ResultSlot(landmark_packet.empty_result(0))
+		self.callback_time = 0.0
+
+		# spawn: never fork a process that already runs mediapipe / opencv threads
+		ctx = mproc.get_context('spawn')
+		self.requests = ctx.Queue()
+		self.result_queue = ctx.Queue()
+		self.process = ctx.Process(target=detector_worker, args=(stype, width, height, delegate, max_people, options, self.requests, self.result_queue), daemon=True)
+		self.process.start()
+		self.t = threading.Thread(target=self.update, args=(), daemon=True)
+		self.t.start()
+
+	def update(self):
+		while True:
+			item = self.result_queue.get()
+			if item is None: break
+			result, self.callback_time = item
+			self.results.publish(result)
+
+	# latest published result (see result_slot.py)
+	@property
+	def result(self):
+		return self.results.result
+
+	# detect the frame published in ring slot (or a crop of it, see roi_tracker.py)
+	def detect(self, ring, slot, frame_id, timestamp, capture_time, roi=None, max_size=0):
+		self.requests.put((ring.name, ring.shape, slot, frame_id, timestamp, capture_time, roi, max_size, self.apply_filter, self.one_euro_beta))
+
+	def close(self):
+		self.requests.put(None)
+		self.process.join(timeout=2)
+		if self.process.is_alive(): self.process.terminate()
+		self.result_queue.put(None)
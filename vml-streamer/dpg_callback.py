@@ -2,10 +2,21 @@ import sys, subprocess, cv2
 import dearpygui.dearpygui as dpg
 import numpy as np
 import stream_types as st
+import stream_config
+import landmark_packet
+import result_slot
+import face_subsets
+from stream_registry import StreamRegistry
 import platform, time
 
-# recreates raw texture on registry
-def recreate_raw_texture(width=320, height=240):
+# preview texture size and displayed image size (w, h), kept up to date by the functions below
+texture_size = (0, 0)
+image_size = None
+
+# recreates raw texture on registry (display size defaults to the texture size)
+def recreate_raw_texture(width=320, height=240, display_width=None, display_height=None):
+	global texture_size
+	show = dpg.is_item_shown('video_image') if dpg.does_alias_exist('video_image') else True
 	
 	# del texture
 	if dpg.does_alias_exist('cv_frame'): dpg.delete_item('cv_frame')	
@@ -18,14 +29,49 @@ def recreate_raw_texture(width=320, height=240):
 	# recreate texture
 	texture_data = np.zeros(shape=(width, height, 3))
 	dpg.add_raw_texture(width, height, texture_data, format=dpg.mvFormat_Float_rgb, tag='cv_frame', parent='treg')
+	texture_size = (width, height)
 			
 	# recreate image	
 	if dpg.does_alias_exist('video_image_parent'): 
-		dpg.add_image(texture_tag='cv_frame', tag='video_image', parent='video_image_parent', width=width, height=height)
+		dpg.add_image(texture_tag='cv_frame', tag='video_image', parent='video_image_parent', width=display_width or width, height=display_height or height, show=show)
+
+# video size multiplier typed in the UI
+def get_video_size(default=1):
+	return float(dpg.get_value('video_size')) if dpg.does_alias_exist('video_size') else default
+
+# opencv capture api name chosen in the UI
+def get_capture_api():
+	return dpg.get_value('cv_vid_cap_api')
+
+# number of video sources changed: stream source fields only accept existing ones
+def sources_changed(count):
+	global source_count
+	source_count = count
+	for stream_id in stream_groups:
+		dpg.configure_item(f'{stream_id}_stream_source', max_value=max(0, count-1))
+
+# update widgets after the video source changes
+def video_source_changed(vs):
+	is_video  = vs.has_frames()
+	has_image = vs.source_type!='none'
+
+	if is_video:
+		if dpg.does_alias_exist('fps_playback'): dpg.set_value('fps_playback', int(vs.source_fps))
+		if dpg.does_alias_exist('video_frame'): dpg.configure_item('video_frame', max_value=int(vs.frames-1))
+		if dpg.does_alias_exist('webcam_device_number'): dpg.set_value('webcam_device_number', 'None')
+
+	if dpg.does_alias_exist('playback_controls'): dpg.configure_item('playback_controls', show=is_video)
+	if dpg.does_alias_exist('camera_controls'): dpg.configure_item('camera_controls', show=not is_video)
+
+	recreate_raw_texture(vs.width, vs.height)
+	resize_viewport(vs.width)
+
+	if dpg.does_alias_exist('video_image'): dpg.configure_item('video_image', show=has_image)
+	if dpg.does_alias_exist('video_image_empty'): dpg.configure_item('video_image_empty', show=not has_image)
 
-# remap value between range
-def change_range(unscaled, from_min, from_max, to_min, to_max):
-	return (to_max-to_min)*(unscaled-from_min)/(from_max-from_min)+to_min
+	if not has_image:
+		dpg.set_viewport_width(450)
+		dpg.set_viewport_height(720)
 
 # list available webcam devices
 def get_connected_devices(test_num_ports=5):
@@ -42,14 +88,17 @@ def get_connected_devices(test_num_ports=5):
 		dev_port +=1
 	return working_ports
 
-# resize webcam texture to match main window size
+# resize webcam texture to match main window size (user_data: VideoStream, or a function returning the displayed one)
 def resize_img(sender, app_data, user_data):
+	global image_size
 	img = 'video_image'
 	win = 'mainwin'
+	vs = user_data() if callable(user_data) else user_data
 	w, h = dpg.get_item_rect_size(win)
-	aspect = user_data.height/user_data.width
+	aspect = vs.height/vs.width
 	newW = w-18
 	newH = newW*aspect
+	image_size = (newW, newH)
 	if dpg.does_alias_exist(img):
 		dpg.configure_item(img, width=newW)
 		dpg.configure_item(img, height=newH)
@@ -69,106 +118,58 @@ def show_filebrowser(fb):
 def always_on_top(sender):
 	dpg.configure_viewport(0, always_on_top=dpg.get_value(sender))
 
+# all streams as plain data, edited only from the callbacks below
+registry = StreamRegistry()
+
+# ui group of each stream id
+stream_groups = {}
+
+# video source new streams read from (the one selected in the UI) and number of sources
+current_source = 0
+source_count = 1
+
 # display extra settings for chosen stream type
-def show_extra_settings(sender, app_data, user_data):
+def show_extra_settings(stream_id, stype):
 	for t in st.ALL:
-		tag_settings_hide = f'{user_data}_{t}_settings'
-		dpg.hide_item(tag_settings_hide)
-	dpg.show_item(f'{user_data}_{dpg.get_value(sender)}_settings')
-
-# rebuild stream list indices after some stream is deleted
-def rebuild_indices():
-	streams_grp = 'streams'
-	aliases = dpg.get_aliases()
-	for i, child in enumerate(dpg.get_item_children(streams_grp, 1)):
-		cur_index  = str(i)
-		orig_index = dpg.get_value(dpg.get_item_children(child, 1)[0])
-		for old_alias in aliases:
-			if old_alias.startswith(f'{orig_index}_'):
-				new_alias = '_'.join(old_alias.split('_')[1:])
-				new_alias = cur_index+'_'+new_alias
-				item_id = dpg.get_alias_id(old_alias)
-				if dpg.does_alias_exist(new_alias): dpg.remove_alias(new_alias)
-				dpg.add_alias(new_alias, item_id)
-				dpg.set_item_alias(item_id, new_alias)
-
-# get all custom settings for a specific stream type and index
-def get_stream_settings(tp, idx):
-	aliases = dpg.get_aliases()
-	settings = {}
-	for alias in aliases:
-		if alias.startswith(f'{idx}_{tp}_settings_'):
-			settings[alias.split('_')[3]] = dpg.get_value(alias)
-	return settings
-
-# return a dictionary with all stream inputs
-def get_streams():
-	streams_grp = 'streams'
-	streams = []
-	for i, child in enumerate(dpg.get_item_children(streams_grp, 1)):
-		address = dpg.get_value(f'{i}_stream_address')
-		port    = dpg.get_value(f'{i}_stream_port')
-		stype   = dpg.get_value(f'{i}_stream_type')
-
-		stream = {
-			'type': stype,
-			'address': address,
-			'port': int(port),
-		}
-	
-		# extra settings
-		stream.update(get_stream_settings(stype, i))
-		
-		# extra settings calculated
-		if stype in [st.ST_MP_HANDS]:
-			stream['beta'] = change_range(stream['smoothingFactor'], 0, 100, 100, 0.5)
+		dpg.hide_item(f'{stream_id}_{t}_settings')
+	dpg.show_item(f'{stream_id}_{stype}_settings')
 
-		streams.append(stream)
+# stream type combo changed
+def stream_type_changed(sender, app_data, user_data):
+	show_extra_settings(user_data, app_data)
+	registry.update(user_data, 'type', app_data)
 
-	return streams
+# any other stream widget changed, user_data: (stream id, setting name, stream type or None for address / port)
+def stream_setting_changed(sender, app_data, user_data):
+	stream_id, key, stype = user_data
+	if key=='port':
+		try: app_data = int(app_data)
+		except ValueError: return
+	if key=='faceIndices':
+		try: face_subsets.parse_indices(app_data)
+		except ValueError: return
+	registry.update(stream_id, key, app_data, stype)
 
-# get next valid stream port and index
-def get_new_stream_input():
-	streams_grp = 'streams'
-	ports = [11110]
-	stream_group = dpg.get_item_children(streams_grp, 1)
-	for i, child in enumerate(stream_group):
-		item = dpg.get_item_children(dpg.get_item_children(child, 1)[3], 1)[3]
-		port = dpg.get_value(item)
-		ports.append(int(port))
-	
-	ret = {
-		'port': max(ports)+1,
-		'index': len(stream_group),
-	}
-	return ret
+# streams snapshot for the streaming loop (no ui calls)
+def get_streams():
+	return registry.snapshot()
 
 # remove a stream
 def del_stream(sender, app_data, user_data):
-	global ts, ts_last, data_last	
-	streams_grp = 'streams'
-	index = user_data
-	stream = f'{index}_stream_input'
-	dpg.delete_item(stream)	
-	rebuild_indices()
-	ts = {}
-	ts_last = {}
-	data_last = {}
+	stream_id = user_data
+	dpg.delete_item(stream_groups.pop(stream_id))
+	registry.remove(stream_id)
 
 # add a stream
 def add_stream(sender, app_data, user_data):
 	# defaults
 	streams_grp = 'streams'
 	stream_types = st.ALL
-	
-	stream_input = get_new_stream_input()
-	index = stream_input['index']
-	port  = stream_input['port']
+	port = registry.next_port()
+	index = registry.add(stream_types[0], '127.0.0.1', port, current_source)  # stream id, tags below are unique per stream
 
 	with dpg.group(parent='streams', tag=f'{index}_stream_input') as grp:
-
-		# keep track of item index
-		dpg.add_input_text(default_value=index, show=False)
+		stream_groups[index] = grp
 		
 		# title
 		dpg.add_spacer(height=5)
@@ -182,38 +183,117 @@ def add_stream(sender, app_data, user_data):
 			# ip address
 			tag = f'{index}_stream_address'
 			dpg.add_text('Address:')
-			dpg.add_input_text(tag=tag, width=120)
+			dpg.add_input_text(tag=tag, width=120, callback=stream_setting_changed, user_data=(index, 'address', None))
 			dpg.set_value(tag, '127.0.0.1')
 
 			# port
 			tag = f'{index}_stream_port'
 			dpg.add_text('Port:')
-			dpg.add_input_text(tag=tag, width=60)
+			dpg.add_input_text(tag=tag, width=60, callback=stream_setting_changed, user_data=(index, 'port', None))
 			dpg.set_value(tag, str(port))
 
+			# video source
+			tag = f'{index}_stream_source'
+			dpg.add_text('Source:')
+			dpg.add_input_int(tag=tag, default_value=current_source, min_value=0, max_value=max(0, source_count-1), min_clamped=True, max_clamped=True, step=0, width=30, callback=stream_setting_changed, user_data=(index, 'source', None))
+			with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Video source this stream reads (index, see the "Source" selector above). Each source is captured and processed on its own threads.', wrap=200)
+
 		with dpg.group(horizontal=True):
 			# stream type
 			tag = f'{index}_stream_type'
 			dpg.add_text('Type:')
-			dpg.add_combo(items=stream_types, tag=tag, width=255, callback=show_extra_settings, user_data=index)
+			dpg.add_combo(items=stream_types, tag=tag, width=255, callback=stream_type_changed, user_data=index)
 			dpg.set_value(tag, stream_types[0])
 
 		# extra settings per stream type
 		for t in st.ALL:
 
 			tag_settings = f'{index}_{t}_settings'
+			defaults = stream_config.STREAM_DEFAULTS.get(t, {})
+
+			# custom extra settings for VIDEO
+			if t == st.ST_VIDEO:
+				with dpg.group(tag=tag_settings, indent=20, show=False):
+					with dpg.group(horizontal=True):
+						dpg.add_text('Chunked frames:'.ljust(20), color=(245, 212, 66))
+						dpg.add_checkbox(tag=f'{tag_settings}_chunked', default_value=defaults['chunked'], callback=stream_setting_changed, user_data=(index, 'chunked', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Splits each jpg frame into MTU sized datagrams with a frame id header (see video_protocol.py). Disable for legacy receivers expecting one datagram per frame (frames over 64KB are dropped).', wrap=200)
+						dpg.add_input_int(tag=f'{tag_settings}_packetSize', default_value=defaults['packetSize'], min_value=128, max_value=65507, min_clamped=True, max_clamped=True, step=0, width=60, callback=stream_setting_changed, user_data=(index, 'packetSize', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Datagram size in bytes (MTU - 28).', wrap=200)
 
-			# custom extra settings for MP_HANDS
-			if t == st.ST_MP_HANDS:
+			# custom extra settings for MP_HANDS / MP_BODY / MP_FACE
+			elif t in [st.ST_MP_HANDS, st.ST_MP_BODY, st.ST_MP_FACE]:
 				with dpg.group(tag=tag_settings, indent=20, show=False):
 					with dpg.group(horizontal=True):
 						dpg.add_text('Motion filter:'.ljust(20), color=(245, 212, 66))
-						dpg.add_checkbox(tag=f'{tag_settings}_applyFilter', default_value=True)
+						dpg.add_checkbox(tag=f'{tag_settings}_applyFilter', default_value=defaults['applyFilter'], callback=stream_setting_changed, user_data=(index, 'applyFilter', t))
 						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Applies a "One-Euro" smoothing filter over the input signal.', wrap=200)
-						dpg.add_slider_float(tag=f'{tag_settings}_smoothingFactor', default_value=60, min_value=0, max_value=100, width=120)
+						dpg.add_slider_float(tag=f'{tag_settings}_smoothingFactor', default_value=defaults['smoothingFactor'], min_value=0, max_value=100, width=120, callback=stream_setting_changed, user_data=(index, 'smoothingFactor', t))
+					with dpg.group(horizontal=True):
+						dpg.add_text('Prediction:'.ljust(20), color=(245, 212, 66))
+						dpg.add_checkbox(tag=f'{tag_settings}_predict', default_value=defaults['predict'], callback=stream_setting_changed, user_data=(index, 'predict', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Extrapolates landmarks forward in time (using the filtered joint velocity) to compensate for camera, detection and filter latency. Extrapolation is reduced when detection confidence drops.', wrap=200)
+						dpg.add_slider_int(tag=f'{tag_settings}_predictLatency', default_value=defaults['predictLatency'], min_value=0, max_value=250, format='%d ms', width=90, callback=stream_setting_changed, user_data=(index, 'predictLatency', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Latency to compensate, 0 = measured (capture to send).', wrap=200)
+						dpg.add_checkbox(tag=f'{tag_settings}_predictAcceleration', label='accel', default_value=defaults['predictAcceleration'], callback=stream_setting_changed, user_data=(index, 'predictAcceleration', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Also extrapolate with joint acceleration (more responsive, more overshoot).', wrap=200)
+					if t == st.ST_MP_HANDS:
+						with dpg.group(horizontal=True):
+							dpg.add_text('Ensure both hands:'.ljust(20), color=(245, 212, 66))
+							dpg.add_checkbox(tag=f'{tag_settings}_ensureHands', default_value=defaults['ensureHands'], callback=stream_setting_changed, user_data=(index, 'ensureHands', t))
+					with dpg.group(horizontal=True):
+						dpg.add_text(('Max hands:' if t == st.ST_MP_HANDS else 'Max people:').ljust(20), color=(245, 212, 66))
+						dpg.add_input_int(tag=f'{tag_settings}_maxPeople', default_value=defaults['maxPeople'], min_value=1, max_value=10, min_clamped=True, max_clamped=True, step=0, width=40, callback=stream_setting_changed, user_data=(index, 'maxPeople', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('People keep a persistent id while tracked (names Body0, Body1... / Left, Right, Left1, Right1...), the first ones found keep the lowest ids. The detector finds as many people as the most demanding stream (changing it restarts the detector).', wrap=200)
+					if t == st.ST_MP_FACE:
+						with dpg.group(horizontal=True):
+							dpg.add_text('Face landmarks:'.ljust(20), color=(245, 212, 66))
+							dpg.add_combo(items=face_subsets.FACE_SUBSETS, tag=f'{tag_settings}_faceLandmarks', default_value=defaults['faceLandmarks'], width=120, callback=stream_setting_changed, user_data=(index, 'faceLandmarks', t))
+							with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Landmarks sent: all 478, a subset (indices sorted), the custom indices or none (blendshapes / transform only).', wrap=200)
+							dpg.add_input_text(tag=f'{tag_settings}_faceIndices', default_value=defaults['faceIndices'], hint='0, 13, 61-80', width=120, on_enter=True, callback=stream_setting_changed, user_data=(index, 'faceIndices', t))
+							with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Custom landmark indices (0-477, ranges allowed), sent in this order. Press enter to apply.', wrap=200)
+						with dpg.group(horizontal=True):
+							dpg.add_text('Face outputs:'.ljust(20), color=(245, 212, 66))
+							dpg.add_checkbox(tag=f'{tag_settings}_faceBlendshapes', label='blendshapes', default_value=defaults['faceBlendshapes'], callback=stream_setting_changed, user_data=(index, 'faceBlendshapes', t))
+							with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Also sends the 52 blendshape scores per face (binary: see landmark_packet.BLENDSHAPE_NAMES for the order).', wrap=200)
+							dpg.add_checkbox(tag=f'{tag_settings}_faceTransform', label='transform', default_value=defaults['faceTransform'], callback=stream_setting_changed, user_data=(index, 'faceTransform', t))
+							with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Also sends the 4x4 facial transformation matrix per face. Blendshapes and transform are only computed while some stream sends them.', wrap=200)
+					with dpg.group(horizontal=True):
+						dpg.add_text('Encoding:'.ljust(20), color=(245, 212, 66))
+						dpg.add_combo(items=landmark_packet.ENCODINGS, tag=f'{tag_settings}_encoding', default_value=defaults['encoding'], width=120, callback=stream_setting_changed, user_data=(index, 'encoding', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Binary: float32 landmark arrays with a small header (see landmark_packet.py). Quantized: int16 keyframes and int8 deltas, decode with landmark_packet.QuantizedDecoder. JSON: legacy dict of x,y,z points.', wrap=200)
+						dpg.add_input_float(tag=f'{tag_settings}_quantRange', default_value=defaults['quantRange'], min_value=0.01, min_clamped=True, step=0, format='+-%.2f', width=60, callback=stream_setting_changed, user_data=(index, 'quantRange', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Quantized: coordinate range (+-), values outside are clipped (see "quantized_clipped" in the stats). Precision is range/32767. Hands are camera space meters (z grows with the distance to the camera), body meters around the hips, face normalized image coordinates.', wrap=200)
+						dpg.add_input_float(tag=f'{tag_settings}_keyframeInterval', default_value=defaults['keyframeInterval'], min_value=0.1, min_clamped=True, step=0, format='%.1f s', width=50, callback=stream_setting_changed, user_data=(index, 'keyframeInterval', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Quantized: seconds between keyframes. Receivers that missed one skip deltas until the next.', wrap=200)
+					with dpg.group(horizontal=True):
+						dpg.add_text('Send on change:'.ljust(20), color=(245, 212, 66))
+						dpg.add_input_float(tag=f'{tag_settings}_changeThreshold', default_value=defaults['changeThreshold'], min_value=0, min_clamped=True, step=0, format='%.4f', width=60, callback=stream_setting_changed, user_data=(index, 'changeThreshold', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Only sends when some landmark (or face output) moved more than this since the last send, 0 = sends every frame. Stops identical packets while nobody is in frame.', wrap=200)
+						dpg.add_input_float(tag=f'{tag_settings}_keepalive', default_value=defaults['keepalive'], min_value=0.1, min_clamped=True, step=0, format='%.1f s', width=50, callback=stream_setting_changed, user_data=(index, 'keepalive', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Keepalive: unchanged data is still resent this often.', wrap=200)
+					with dpg.group(horizontal=True):
+						dpg.add_text('Results:'.ljust(20), color=(245, 212, 66))
+						dpg.add_combo(items=result_slot.RESULT_MODES, tag=f'{tag_settings}_resultMode', default_value=defaults['resultMode'], width=120, callback=stream_setting_changed, user_data=(index, 'resultMode', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Latest: newest detection on every frame (may repeat one). Fresh only: every detection is sent once. Wait: waits for the last detection started (up to the given time), then sends the latest.', wrap=200)
+						dpg.add_input_int(tag=f'{tag_settings}_waitMs', default_value=defaults['waitMs'], min_value=0, max_value=200, min_clamped=True, max_clamped=True, step=0, width=60, callback=stream_setting_changed, user_data=(index, 'waitMs', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Max wait in ms ("Wait" mode only).', wrap=200)
+					with dpg.group(horizontal=True):
+						dpg.add_text('Rate / budget:'.ljust(20), color=(245, 212, 66))
+						dpg.add_input_int(tag=f'{tag_settings}_rate', default_value=defaults['rate'], min_value=0, max_value=240, min_clamped=True, max_clamped=True, step=0, width=40, callback=stream_setting_changed, user_data=(index, 'rate', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Target rate in Hz (detection and sends), 0 = every frame. The detector runs at the highest rate of its streams.', wrap=200)
+						dpg.add_input_int(tag=f'{tag_settings}_latencyBudget', default_value=defaults['latencyBudget'], min_value=1, max_value=1000, min_clamped=True, max_clamped=True, step=0, width=40, callback=stream_setting_changed, user_data=(index, 'latencyBudget', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Latency budget in ms (capture to result). When detectors miss their budget, the lowest priority ones are slowed down first.', wrap=200)
+						dpg.add_input_int(tag=f'{tag_settings}_priority', default_value=defaults['priority'], min_value=0, max_value=10, min_clamped=True, max_clamped=True, step=0, width=30, callback=stream_setting_changed, user_data=(index, 'priority', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Priority, higher priority detectors are slowed down last.', wrap=200)
+
+			# custom extra settings for STATS
+			elif t == st.ST_STATS:
+				with dpg.group(tag=tag_settings, indent=20, show=False):
 					with dpg.group(horizontal=True):
-						dpg.add_text('Ensure both hands:'.ljust(20), color=(245, 212, 66))
-						dpg.add_checkbox(tag=f'{tag_settings}_ensureHands', default_value=False)
+						dpg.add_text('Interval:'.ljust(20), color=(245, 212, 66))
+						dpg.add_input_float(tag=f'{tag_settings}_interval', default_value=defaults['interval'], min_value=0.1, min_clamped=True, step=0, format='%.1f s', width=60, callback=stream_setting_changed, user_data=(index, 'interval', t))
+						with dpg.tooltip(parent=dpg.last_item()): dpg.add_text('Sends pipeline timings (p50/p95/p99 per stage, ms), fps and network counters as json.', wrap=200)
 
 			# empty extra settings by default
 			else:
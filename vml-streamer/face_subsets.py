@@ -0,0 +1,44 @@
+import numpy as np
+
+# face landmarks sent per stream ('faceLandmarks'), 'Custom' uses the 'faceIndices' list
+FACE_ALL    = 'All'
+FACE_CUSTOM = 'Custom'
+FACE_NONE   = 'None'
+FACE_SUBSETS = [FACE_ALL, 'Lips', 'Eyes', 'Brows', 'Lips, eyes, brows', 'Irises', 'Contours', FACE_CUSTOM, FACE_NONE]
+NUM_FACE_LANDMARKS = 478
+
+# mediapipe face mesh connection sets of each subset (loaded on first use, keeps stream configs free of mediapipe)
+def subset_connections(name):
+	from mediapipe import solutions
+	fm = solutions.face_mesh
+	return {
+		'Lips':              [fm.FACEMESH_LIPS],
+		'Eyes':              [fm.FACEMESH_LEFT_EYE, fm.FACEMESH_RIGHT_EYE],
+		'Brows':             [fm.FACEMESH_LEFT_EYEBROW, fm.FACEMESH_RIGHT_EYEBROW],
+		'Lips, eyes, brows': [fm.FACEMESH_LIPS, fm.FACEMESH_LEFT_EYE, fm.FACEMESH_RIGHT_EYE, fm.FACEMESH_LEFT_EYEBROW, fm.FACEMESH_RIGHT_EYEBROW],
+		'Irises':            [fm.FACEMESH_IRISES],
+		'Contours':          [fm.FACEMESH_CONTOURS],
+	}[name]
+
+# custom indices from a list or a '1, 2, 10-20' string, raises ValueError
+def parse_indices(indices):
+	if isinstance(indices, str):
+		values = []
+		for part in indices.replace(';', ',').split(','):
+			part = part.strip()
+			if not part: continue
+			if '-' in part:
+				first, last = part.split('-', 1)
+				values.extend(range(int(first), int(last)+1))
+			else: values.append(int(part))
+		indices = values
+	indices = [int(i) for i in indices]
+	if any(not 0 <= i < NUM_FACE_LANDMARKS for i in indices): raise ValueError(f'face landmark indices must be between 0 and {NUM_FACE_LANDMARKS-1}')
+	return indices
+
+# landmark indices of a subset (presets sorted, custom ones as given), None = all landmarks (no slicing needed)
+def subset_indices(name, custom=()):
+	if name == FACE_ALL: return None
+	if name == FACE_NONE: return np.zeros(0, dtype=int)
+	if name == FACE_CUSTOM: return np.asarray(parse_indices(custom), dtype=int)
+	return np.asarray(sorted({i for connections in subset_connections(name) for edge in connections for i in edge}), dtype=int)
@@ -0,0 +1,56 @@
+import sys, argparse
+from mediapipe import tasks
+from source_manager import SourceManager
+from pipeline_stats import StatsDumper
+import stream_config
+
+#---------------------------------------------------------#
+# run VML Streamer without a user interface, streams are
+# loaded from a json config file (see stream_config.py)
+#
+#   python headless.py streams.json
+#---------------------------------------------------------#
+def main():
+	parser = argparse.ArgumentParser(description='VML Streamer (headless)')
+	parser.add_argument('config', help='json config file with video source and stream definitions')
+	parser.add_argument('--delegate', choices=stream_config.DELEGATES, help='mediapipe delegate, overrides the config "delegate" (cpu on machines without a usable GPU)')
+	args = parser.parse_args()
+
+	try: config = stream_config.load(args.config)
+	except (OSError, ValueError) as e:
+		print(f'Could not load config "{args.config}": {e}', file=sys.stderr)
+		return 1
+
+	# streaming pipeline per video source, processed in parallel (no overlay drawing or preview, nobody is looking)
+	delegate = {'auto': None, 'cpu': tasks.BaseOptions.Delegate.CPU, 'gpu': tasks.BaseOptions.Delegate.GPU}[args.delegate or config['delegate']]
+	sources = SourceManager(draw_overlay=False, preview=False, detector_processes=config['detector_processes'], delegate=delegate,
+		roi_tracking=config['roi_tracking'], roi_max_size=config['roi_max_size'])
+	for i, source in enumerate(config['sources']):
+		vs = sources.add(source['type'], source['file'], source['size'], source['capture_api'], source['cache_mb'], source['flip'], source['fps'], source['loop']).vs
+		if not vs.isOpened():
+			print(f'Could not open video source {i}: {source["file"]}', file=sys.stderr)
+			sources.stop()
+			return 1
+		print(f'Source {i}: {vs.source_type} ({vs.width}x{vs.height}), {sum(s["source"] == i for s in config["streams"])} stream(s)')
+
+	if config['record']:
+		sources.start_recording(config['record'])
+		print(f'Recording to {config["record"]}')
+
+	# periodic pipeline timings (monitoring)
+	if config['stats_file']: StatsDumper(sources, config['stats_file'], config['stats_interval'])
+
+	print(f'Streaming {len(sources)} source(s) to {len(config["streams"])} stream(s), press CTRL+C to stop.')
+	try:
+		sources.start(config['streams'])
+		sources.wait()
+	except KeyboardInterrupt: pass
+	finally:
+		sources.stop()
+
+	failed = sources.failed()
+	for source in failed: print(f'Source {source.index} failed: {source.error!r}', file=sys.stderr)
+	return 1 if failed else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
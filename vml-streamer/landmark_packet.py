@@ -0,0 +1,304 @@
+import struct, json, time
+from collections import namedtuple
+import numpy as np
+import stream_types as st
+
+#---------------------------------------------------------#
+# Binary landmark packet (udp), little endian:
+#
+#   header (28 bytes):
+#     magic        4s   b'VMLL'
+#     version      B
+#     stream_type  B    see STREAM_TYPE_CODES
+#     frame_id     I    id of the detected frame
+#     timestamp    d    capture time (seconds since epoch)
+#     age          f    seconds from capture to send
+#     people       H
+#     joints       H
+#     dims         B
+#     extras       B    flags of the optional blocks below (was reserved, 0)
+#   names:         one per person, length byte + utf-8 (eg: 'Left', 'Body0')
+#   landmarks:     float32 array, shape (people, joints, dims)
+#   blendshapes:   (extras & EXTRA_BLENDSHAPES) count H, then
+#                  float32 (people, count) face blendshape
+#                  scores, in BLENDSHAPE_NAMES order
+#   transforms:    (extras & EXTRA_TRANSFORMS) float32
+#                  (people, 4, 4) face transformation matrices
+#
+# Receivers can use decode() below, landmarks are read
+# with np.frombuffer (no parsing involved). Version 1
+# packets (no age field) are still decoded, age is None.
+# Older decoders ignore the optional blocks.
+#
+# Quantized packets (version 3, 'Quantized' encoding)
+# have the same header and names, then:
+#   quant:         flags B (QUANT_KEYFRAME), keyframe id H,
+#                  range f
+#   landmarks:     keyframes: int16 (people, joints, dims),
+#                  value = q/32767*range (clipped to range)
+#                  deltas: int8 (people, joints, dims), q
+#                  minus the q of keyframe 'keyframe id'
+#   optional blocks as above (float32)
+# Deltas need the keyframe they refer to, receivers keep
+# it with a QuantizedDecoder (deltas arriving without it
+# are skipped until the next keyframe).
+#---------------------------------------------------------#
+
+MAGIC     = b'VMLL'
+VERSION   = 2
+VERSION_QUANTIZED = 3
+HEADER    = struct.Struct('<4sBBIdfHHBB')
+HEADER_V1 = struct.Struct('<4sBBIdHHBx')
+DTYPE   = np.dtype('<f4')
+
+# optional blocks (extras flags)
+EXTRA_BLENDSHAPES = 1
+EXTRA_TRANSFORMS  = 2
+BLENDSHAPES_HEADER = struct.Struct('<H')
+
+# quantized landmarks
+QUANT_HEADER   = struct.Struct('<BHf')
+QUANT_KEYFRAME = 1
+QUANT_MAX      = 32767
+QUANT_DTYPE    = np.dtype('<i2')
+DELTA_DTYPE    = np.dtype('i1')
+DELTA_MAX      = 127
+
+# mediapipe face blendshape categories, by category index
+BLENDSHAPE_NAMES = [
+	'_neutral', 'browDownLeft', 'browDownRight', 'browInnerUp', 'browOuterUpLeft', 'browOuterUpRight', 'cheekPuff',
+	'cheekSquintLeft', 'cheekSquintRight', 'eyeBlinkLeft', 'eyeBlinkRight', 'eyeLookDownLeft', 'eyeLookDownRight',
+	'eyeLookInLeft', 'eyeLookInRight', 'eyeLookOutLeft', 'eyeLookOutRight', 'eyeLookUpLeft', 'eyeLookUpRight',
+	'eyeSquintLeft', 'eyeSquintRight', 'eyeWideLeft', 'eyeWideRight', 'jawForward', 'jawLeft', 'jawOpen', 'jawRight',
+	'mouthClose', 'mouthDimpleLeft', 'mouthDimpleRight', 'mouthFrownLeft', 'mouthFrownRight', 'mouthFunnel', 'mouthLeft',
+	'mouthLowerDownLeft', 'mouthLowerDownRight', 'mouthPressLeft', 'mouthPressRight', 'mouthPucker', 'mouthRight',
+	'mouthRollLower', 'mouthRollUpper', 'mouthShrugLower', 'mouthShrugUpper', 'mouthSmileLeft', 'mouthSmileRight',
+	'mouthStretchLeft', 'mouthStretchRight', 'mouthUpperUpLeft', 'mouthUpperUpRight', 'noseSneerLeft', 'noseSneerRight',
+]
+
+# stream type ids sent on the wire
+STREAM_TYPE_CODES = {
+	st.ST_MP_HANDS: 1,
+	st.ST_MP_BODY:  2,
+	st.ST_MP_FACE:  3,
+}
+STREAM_TYPES_BY_CODE = {v: k for k, v in STREAM_TYPE_CODES.items()}
+
+# landmark encodings per stream
+ENC_BINARY = 'Binary'
+ENC_JSON   = 'JSON'     # compatibility mode: {name: [{'x':..,'y':..,'z':..}, ...]}
+ENC_QUANTIZED = 'Quantized'  # int16 keyframes + int8 deltas (see QuantizedEncoder)
+ENCODINGS  = [ENC_BINARY, ENC_QUANTIZED, ENC_JSON]
+
+LandmarkPacket = namedtuple('LandmarkPacket', ['stream_type', 'frame_id', 'timestamp', 'names', 'landmarks', 'age', 'blendshapes', 'transforms'], defaults=(None, None))
+
+# detector output, published as a single object so readers never see a half updated result
+#   names:        person labels (eg: 'Left', 'Body0')
+#   keys:         unique person keys (filter / prediction state)
+#   landmarks:    float32 (people, joints, 3)
+#   velocity:     float32 (people, joints, 3), units per second
+#   confidence:   float32 (people,)
+#   capture_time: capture time of the detected frame
+#   frame_id:     engine frame id of the detected frame (-1: no frame yet)
+#   display_image: RGB copy of the detected frame with the skeleton overlay, None if not drawn
+#   bounds:       float32 (people, 4), image space boxes (x0, y0, x1, y1), normalized to the full frame
+#   blendshapes:  float32 (people, len(BLENDSHAPE_NAMES)) face blendshape scores, None if not detected
+#   transforms:   float32 (people, 4, 4) face transformation matrices, None if not detected
+LandmarkResult = namedtuple('LandmarkResult', ['names', 'keys', 'landmarks', 'velocity', 'confidence', 'capture_time', 'frame_id', 'display_image', 'bounds', 'blendshapes', 'transforms'], defaults=(-1, None, None, None, None))
+
+# result with no people detected
+def empty_result(num_joints, capture_time=0.0, frame_id=-1):
+	return LandmarkResult([], [], np.zeros((0, num_joints, 3), dtype=DTYPE), np.zeros((0, num_joints, 3), dtype=DTYPE), np.zeros(0, dtype=DTYPE), capture_time, frame_id, None, np.zeros((0, 4), dtype=DTYPE))
+
+# header and names block
+def encode_header(version, stream_type, frame_id, timestamp, names, shape, age, blendshapes, transforms):
+	people, joints, dims = shape
+	extras = (EXTRA_BLENDSHAPES if blendshapes is not None else 0) | (EXTRA_TRANSFORMS if transforms is not None else 0)
+	header = HEADER.pack(MAGIC, version, STREAM_TYPE_CODES[stream_type], frame_id & 0xFFFFFFFF, timestamp, age, people, joints, dims, extras)
+	return header + b''.join(bytes([len(n)]) + n for n in (name.encode()[:255] for name in names))
+
+# optional blocks (float32, see extras flags)
+def encode_extras(people, blendshapes, transforms):
+	block = b''
+	if blendshapes is not None:
+		blendshapes = np.ascontiguousarray(blendshapes, dtype=DTYPE)
+		blendshapes = blendshapes.reshape(people, blendshapes.shape[-1] if blendshapes.ndim > 1 else len(BLENDSHAPE_NAMES))  # count is explicit, no people -> (0, count)
+		block += BLENDSHAPES_HEADER.pack(blendshapes.shape[1]) + blendshapes.tobytes()
+	if transforms is not None: block += np.ascontiguousarray(transforms, dtype=DTYPE).reshape(people, 4, 4).tobytes()
+	return block
+
+# encode landmarks (people, joints, dims) to a binary packet, optionally with blendshapes (people, count) and transforms (people, 4, 4)
+def encode(stream_type, frame_id, timestamp, names, landmarks, age=0.0, blendshapes=None, transforms=None):
+	landmarks = np.ascontiguousarray(landmarks, dtype=DTYPE)
+	header = encode_header(VERSION, stream_type, frame_id, timestamp, names, landmarks.shape, age, blendshapes, transforms)
+	return header + landmarks.tobytes() + encode_extras(len(landmarks), blendshapes, transforms)
+
+# landmarks to int16 steps of range/32767 (values outside [-range, range] are clipped)
+def quantize(landmarks, scale):
+	return np.rint(np.clip(np.asarray(landmarks, dtype=np.float32)/scale, -1, 1)*QUANT_MAX).astype(QUANT_DTYPE)
+
+def dequantize(values, scale):
+	return (values*np.float32(scale/QUANT_MAX)).astype(DTYPE)
+
+#---------------------------------------------------------#
+# quantized stream encoder ('Quantized' encoding): sends
+# a keyframe (int16 landmarks) every keyframe_interval
+# seconds, and int8 deltas against it in between. Falls
+# back to a keyframe whenever a delta doesn't fit (fast
+# motion) or the people / landmark count changed. Deltas
+# never chain, a lost packet only loses that frame.
+#---------------------------------------------------------#
+class QuantizedEncoder:
+
+	# scale: landmark range (+-), keyframe_interval: seconds
+	def __init__(self, scale=2.0, keyframe_interval=1.0):
+		self.scale = scale
+		self.keyframe_interval = keyframe_interval
+		self.key_id = -1
+		self.keyframe = None    # int16 values of the last keyframe
+		self.key_time = 0.0
+		self.clipped = 0        # values sent clipped to the range so far (range too small, see engine stats)
+
+	def encode(self, stream_type, frame_id, timestamp, names, landmarks, age=0.0, blendshapes=None, transforms=None, now=None):
+		now = time.perf_counter() if now is None else now
+		values = quantize(landmarks, self.scale)
+		self.clipped += int(np.count_nonzero(np.abs(landmarks) > self.scale))
+
+		# delta against the last keyframe when it fits
+		deltas = None
+		if self.keyframe is not None and self.keyframe.shape == values.shape and now - self.key_time < self.keyframe_interval:
+			deltas = values.astype(np.int32) - self.keyframe
+			if deltas.size and np.abs(deltas).max() > DELTA_MAX: deltas = None
+
+		if deltas is None:
+			self.key_id = (self.key_id+1) & 0xFFFF
+			self.keyframe = values
+			self.key_time = now
+			flags, block = QUANT_KEYFRAME, values.tobytes()
+		else: flags, block = 0, deltas.astype(DELTA_DTYPE).tobytes()
+
+		header = encode_header(VERSION_QUANTIZED, stream_type, frame_id, timestamp, names, values.shape, age, blendshapes, transforms)
+		return header + QUANT_HEADER.pack(flags, self.key_id, self.scale) + block + encode_extras(len(values), blendshapes, transforms)
+
+#---------------------------------------------------------#
+# change suppression: a stream only sends when its data
+# moved more than a threshold since its last send (or the
+# people changed), and at least every keepalive seconds
+# so receivers can tell a still pose from a dead link
+#---------------------------------------------------------#
+class ChangeGate:
+
+	def __init__(self):
+		self.names = None
+		self.values = ()
+		self.last_sent = 0.0
+
+	# values: arrays sent (landmarks, face extras), threshold: max change of any value (0 = always send), keepalive: seconds
+	def due(self, names, values, threshold, keepalive, now):
+		if threshold <= 0 or self.names is None or now - self.last_sent >= keepalive: return True
+		if names != self.names or len(values) != len(self.values): return True
+		return any(v.shape != last.shape or (v.size and np.abs(v - last).max() > threshold) for v, last in zip(values, self.values))
+
+	def sent(self, names, values, now):
+		self.names = list(names)
+		self.values = values
+		self.last_sent = now
+
+# decode a binary packet, landmarks is a read only view over the packet bytes (quantized packets: dequantized copy,
+# None for deltas, see QuantizedDecoder)
+def decode(packet):
+	return decode_packet(packet)
+
+# keyframes: quantized keyframes per stream type code (id, values), updated by keyframes, used by deltas
+def decode_packet(packet, keyframes=None):
+	magic, version = struct.unpack_from('<4sB', packet)
+	if magic != MAGIC: raise ValueError('Not a landmark packet')
+	if version in (VERSION, VERSION_QUANTIZED):
+		_, _, type_code, frame_id, timestamp, age, people, joints, dims, extras = HEADER.unpack_from(packet)
+		offset = HEADER.size
+	elif version == 1:
+		_, _, type_code, frame_id, timestamp, people, joints, dims = HEADER_V1.unpack_from(packet)
+		age, offset, extras = None, HEADER_V1.size, 0
+	else: raise ValueError(f'Unsupported landmark packet version: {version}')
+
+	names = []
+	for _ in range(people):
+		size = packet[offset]
+		names.append(bytes(packet[offset+1:offset+1+size]).decode())
+		offset += 1+size
+
+	if version == VERSION_QUANTIZED:
+		flags, key_id, scale = QUANT_HEADER.unpack_from(packet, offset)
+		offset += QUANT_HEADER.size
+		if flags & QUANT_KEYFRAME:
+			values = np.frombuffer(packet, dtype=QUANT_DTYPE, count=people*joints*dims, offset=offset).reshape(people, joints, dims)
+			offset += values.nbytes
+			if keyframes is not None: keyframes[type_code] = (key_id, values)
+			landmarks = dequantize(values, scale)
+		else:
+			deltas = np.frombuffer(packet, dtype=DELTA_DTYPE, count=people*joints*dims, offset=offset).reshape(people, joints, dims)
+			offset += deltas.nbytes
+			keyframe = keyframes.get(type_code) if keyframes is not None else None
+			if keyframe is not None and keyframe[0] == key_id and keyframe[1].shape == deltas.shape:
+				landmarks = dequantize(keyframe[1] + deltas.astype(np.int32), scale)
+			else: landmarks = None
+	else:
+		landmarks = np.frombuffer(packet, dtype=DTYPE, count=people*joints*dims, offset=offset).reshape(people, joints, dims)
+		offset += landmarks.nbytes
+
+	blendshapes = transforms = None
+	if extras & EXTRA_BLENDSHAPES:
+		count, = BLENDSHAPES_HEADER.unpack_from(packet, offset)
+		blendshapes = np.frombuffer(packet, dtype=DTYPE, count=people*count, offset=offset+BLENDSHAPES_HEADER.size).reshape(people, count)
+		offset += BLENDSHAPES_HEADER.size + blendshapes.nbytes
+	if extras & EXTRA_TRANSFORMS:
+		transforms = np.frombuffer(packet, dtype=DTYPE, count=people*16, offset=offset).reshape(people, 4, 4)
+	return LandmarkPacket(STREAM_TYPES_BY_CODE.get(type_code, type_code), frame_id, timestamp, names, landmarks, age, blendshapes, transforms)
+
+#---------------------------------------------------------#
+# receiving side of quantized streams: keeps the last
+# keyframe (one decoder per socket), also decodes the
+# other binary packets
+#---------------------------------------------------------#
+class QuantizedDecoder:
+
+	def __init__(self):
+		self.keyframes = {}
+
+	# LandmarkPacket, None for deltas whose keyframe was not received (skip until the next one)
+	def decode(self, packet):
+		packet = decode_packet(packet, self.keyframes)
+		return packet if packet.landmarks is not None else None
+
+# landmarks as the legacy python dict
+def to_dict(names, landmarks):
+	return {name: [dict(zip('xyz', p)) for p in points] for name, points in zip(names, np.asarray(landmarks).tolist())}
+
+# encode landmarks to the legacy json payload. With blendshapes / transforms, each person is
+# {'landmarks': [...], 'blendshapes': {name: score}, 'transform': 4x4 rows} instead (only the blocks sent)
+def encode_json(names, landmarks, blendshapes=None, transforms=None):
+	if blendshapes is None and transforms is None: return json.dumps(to_dict(names, landmarks)).encode()
+	people = {name: {'landmarks': points} for name, points in to_dict(names, landmarks).items()}
+	for i, person in enumerate(people.values()):
+		if blendshapes is not None: person['blendshapes'] = dict(zip(BLENDSHAPE_NAMES, np.asarray(blendshapes[i]).tolist()))
+		if transforms is not None: person['transform'] = np.asarray(transforms[i]).tolist()
+	return json.dumps(people).encode()
+
+# round trip checks of every packet layout: python landmark_packet.py
+if __name__ == '__main__':
+	rng = np.random.default_rng(0)
+	for people in (0, 1, 2):
+		names = [f'Face{i}' for i in range(people)]
+		landmarks = rng.uniform(-1, 1, (people, 478, 3)).astype(DTYPE)
+		blendshapes = rng.random((people, len(BLENDSHAPE_NAMES))).astype(DTYPE)
+		transforms = rng.random((people, 4, 4)).astype(DTYPE)
+		packet = decode(encode(st.ST_MP_FACE, 1, 1.0, names, landmarks, 0.01, blendshapes, transforms))
+		assert packet.names == names and np.array_equal(packet.landmarks, landmarks)
+		assert np.array_equal(packet.blendshapes, blendshapes) and np.array_equal(packet.transforms, transforms)
+		json.loads(encode_json(names, landmarks, blendshapes, transforms))
+
+		decoder, encoder = QuantizedDecoder(), QuantizedEncoder()
+		for now, offset in ((0.0, 0.0), (0.1, 0.001), (0.2, 0.5)):  # keyframe, delta, keyframe (delta too large)
+			packet = decoder.decode(encoder.encode(st.ST_MP_FACE, 1, 1.0, names, landmarks+offset, 0.01, blendshapes, None, now=now))
+			assert np.allclose(packet.landmarks, landmarks+offset, rtol=0, atol=2.0/QUANT_MAX) and np.array_equal(packet.blendshapes, blendshapes)
+	print('ok')
@@ -5,6 +5,7 @@
 
 import math
 import warnings
+import numpy as np
 
 
 def smoothing_factor(t_e, cutoff):
@@ -50,4 +51,99 @@ class OneEuroFilter:
             self.dx_prev = dx_hat
             self.t_prev = t
 
-            return x_hat
\ No newline at end of file
+            return x_hat
+
+
+class OneEuroFilterBank:
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, max_missing=3):
+        """Initialize a bank of one euro filters over (N, J, D) blocks.
+
+        Each of the N rows is a person identified by a key (eg: 'Left',
+        'Body0'). A person that appears starts from the raw signal, a
+        person missing for more than max_missing calls is forgotten.
+        """
+        # The parameters.
+        self.min_cutoff = float(min_cutoff)
+        self.beta = float(beta)
+        self.d_cutoff = float(d_cutoff)
+        self.max_missing = max_missing
+        self.reset()
+
+    def reset(self, shape=None):
+        """Forget all people (shape is the per person (J, D) block)."""
+        self.shape = shape
+        self.slots = {}
+        self.missing = {}
+        self.free_slots = []
+        # Previous values, one row per slot (grown on demand).
+        block = (0,) + (tuple(shape) if shape is not None else (0, 0))
+        self.x_prev = np.zeros(block)
+        self.dx_prev = np.zeros(block)
+        self.t_prev = np.zeros(0)
+
+    def _alloc_slot(self):
+        if not self.free_slots:
+            size = len(self.t_prev)
+            grow = max(size, 4)
+            self.x_prev = np.concatenate((self.x_prev, np.zeros((grow,) + self.x_prev.shape[1:])))
+            self.dx_prev = np.concatenate((self.dx_prev, np.zeros((grow,) + self.dx_prev.shape[1:])))
+            self.t_prev = np.concatenate((self.t_prev, np.zeros(grow)))
+            self.free_slots = list(range(size+grow-1, size-1, -1))
+        return self.free_slots.pop()
+
+    def derivative(self, keys):
+        """Filtered derivative (dx_hat) for each key, shape (N, J, D)."""
+        slots = [self.slots[k] for k in keys]
+        return self.dx_prev[slots]
+
+    def __call__(self, t, keys, x):
+        """Compute the filtered signal for a (N, J, D) block, keys must be unique."""
+        x = np.asarray(x)
+        if x.shape[1:] != self.shape: self.reset(x.shape[1:])
+
+        # Track people that disappeared.
+        present = set(keys)
+        for key in list(self.slots.keys()):
+            if key in present:
+                self.missing[key] = 0
+            else:
+                self.missing[key] += 1
+                if self.missing[key] > self.max_missing:
+                    self.free_slots.append(self.slots.pop(key))
+                    del self.missing[key]
+
+        # Track people that appeared.
+        new = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            if key not in self.slots:
+                self.slots[key] = self._alloc_slot()
+                self.missing[key] = 0
+                new[i] = True
+        slots = np.array([self.slots[k] for k in keys], dtype=int)
+
+        x_prev = self.x_prev[slots]
+        dx_prev = self.dx_prev[slots]
+        t_e = (t - self.t_prev[slots])[:, None, None]
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            # The filtered derivative of the signal.
+            a_d = smoothing_factor(t_e, self.d_cutoff)
+            dx = (x - x_prev) / t_e
+            dx_hat = exponential_smoothing(a_d, dx, dx_prev)
+
+            # The filtered signal.
+            cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+            a = smoothing_factor(t_e, cutoff)
+            x_hat = exponential_smoothing(a, x, x_prev)
+
+        # New people and NaN (eg: t_e == 0) restart from the raw signal.
+        restart = new[:, None, None] | ~np.isfinite(x_hat) | ~np.isfinite(dx_hat)
+        x_hat = np.where(restart, x, x_hat)
+        dx_hat = np.where(restart, 0.0, dx_hat)
+
+        # Memorize the previous values.
+        self.x_prev[slots] = x_hat
+        self.dx_prev[slots] = dx_hat
+        self.t_prev[slots] = t
+
+        return x_hat.astype(x.dtype, copy=False)
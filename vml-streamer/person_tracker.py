@@ -0,0 +1,121 @@
+import numpy as np
+
+# cost of pairs that must never match (different labels), large but finite (keeps the potentials finite)
+FORBIDDEN = 1e6
+
+# minimum cost assignment of a (rows, cols) cost matrix (Hungarian method, shortest augmenting paths with
+# potentials, O(n^2 m) with the inner loop over columns vectorized). Returns matched (rows, cols) index arrays
+def linear_assignment(cost):
+	cost = np.asarray(cost, dtype=np.float64)
+	if cost.size == 0: return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+	transposed = cost.shape[0] > cost.shape[1]
+	if transposed: cost = cost.T
+	n, m = cost.shape
+
+	# common case, every row has its own cheapest column: the sum of row minimums is reached, optimal
+	best = cost.argmin(axis=1)
+	if len(np.unique(best)) == n: return (best, np.arange(n)) if transposed else (np.arange(n), best)
+
+	# 1-based rows / columns, column 0 is the virtual start of each augmenting path
+	cost = np.pad(cost, ((1, 0), (1, 0)))
+	u = np.zeros(n+1)
+	v = np.zeros(m+1)
+	p = np.zeros(m+1, dtype=int)    # row assigned to each column (0 = free)
+	way = np.zeros(m+1, dtype=int)  # previous column on the shortest path
+	for i in range(1, n+1):
+		p[0] = i
+		j0 = 0
+		minv = np.full(m+1, np.inf)
+		used = np.zeros(m+1, dtype=bool)
+		while True:
+			used[j0] = True
+			free = ~used
+
+			# relax the reduced costs of the row reached last, over all free columns at once
+			reduced = cost[p[j0]] - u[p[j0]] - v
+			better = free & (reduced < minv)
+			better[0] = False
+			minv[better] = reduced[better]
+			way[better] = j0
+
+			# closest free column, shift potentials by its distance
+			candidates = np.where(free, minv, np.inf)
+			candidates[0] = np.inf
+			j1 = int(np.argmin(candidates))
+			delta = candidates[j1]
+			u[p[used]] += delta
+			v[used] -= delta
+			minv[free] -= delta
+			j0 = j1
+			if p[j0] == 0: break
+
+		# flip the augmenting path
+		while j0:
+			j1 = way[j0]
+			p[j0] = p[j1]
+			j0 = j1
+
+	cols = np.flatnonzero(p[1:])
+	rows = p[1:][cols] - 1
+	return (cols, rows) if transposed else (rows, cols)
+
+#---------------------------------------------------------#
+# persistent person ids across detections: detections are
+# matched to the tracked people by box center distance
+# (Hungarian matching), unmatched ones get the smallest
+# id free for their label (eg: handedness), so a single
+# performer keeps id 0. People briefly lost keep their
+# id for a few results, unless the detector maximum is
+# reached (room for new ones).
+#---------------------------------------------------------#
+class PersonTracker:
+
+	def __init__(self, max_people=1, aspect=1.0, max_distance=0.2, max_missing=5):
+		self.max_people = max_people        # detector maximum, tracked + lost people never exceed it
+		self.scale = np.float32([aspect, 1.0])/max(aspect, 1.0)  # normalized image coordinates -> fraction of the long side
+		self.max_distance = max_distance    # max center distance of a match (fraction of the frame long side)
+		self.max_missing = max_missing      # results a lost person keeps its id
+		self.reset()
+
+	def reset(self):
+		self.centers = np.zeros((0, 2), dtype=np.float32)
+		self.labels = np.zeros(0, dtype=object)
+		self.ids = np.zeros(0, dtype=int)
+		self.missing = np.zeros(0, dtype=int)
+
+	# ids of the detections, bounds: (people, 4) normalized boxes, labels: one per person (ids are unique per label)
+	def update(self, bounds, labels):
+		bounds = np.asarray(bounds, dtype=np.float32).reshape(-1, 4)
+		labels = np.asarray(labels, dtype=object).reshape(-1)
+		centers = (bounds[:, :2] + bounds[:, 2:])/2*self.scale
+		ids = np.full(len(bounds), -1, dtype=int)
+		matched = np.zeros(len(self.ids), dtype=bool)
+
+		# tracked people x detections
+		if len(self.ids) and len(bounds):
+			cost = np.sqrt(((self.centers[:, None] - centers[None])**2).sum(axis=2))
+			cost[self.labels[:, None] != labels[None]] = FORBIDDEN
+			rows, cols = linear_assignment(cost)
+			close = cost[rows, cols] <= self.max_distance
+			rows, cols = rows[close], cols[close]
+			ids[cols] = self.ids[rows]
+			matched[rows] = True
+
+		# lost people (most recently seen first), as many as there is room for
+		lost = np.flatnonzero(~matched & (self.missing < self.max_missing))
+		lost = lost[np.argsort(self.missing[lost], kind='stable')][:max(0, self.max_people - len(bounds))]
+
+		# new people: smallest id not taken by someone with the same label
+		for j in np.flatnonzero(ids < 0):
+			taken = set(self.ids[lost][self.labels[lost] == labels[j]].tolist()) | set(ids[labels == labels[j]].tolist())
+			ids[j] = next(i for i in range(len(taken)+1) if i not in taken)
+
+		self.centers = np.concatenate((centers, self.centers[lost]))
+		self.labels = np.concatenate((labels, self.labels[lost]))
+		self.ids = np.concatenate((ids, self.ids[lost]))
+		self.missing = np.concatenate((np.zeros(len(bounds), dtype=int), self.missing[lost]+1))
+		return ids
+
+# order of the people in a result: by id, then label
+def person_order(ids, labels):
+	return sorted(range(len(ids)), key=lambda i: (ids[i], labels[i]))
@@ -0,0 +1,88 @@
+import time, threading, json
+from contextlib import contextmanager
+import numpy as np
+
+#---------------------------------------------------------#
+# last N samples of a timing, percentiles on demand
+#---------------------------------------------------------#
+class RollingStats:
+
+	def __init__(self, size=512):
+		self.samples = np.zeros(size, dtype=np.float64)
+		self.count = 0    # total samples added
+
+	def add(self, value):
+		self.samples[self.count % len(self.samples)] = value
+		self.count += 1
+
+	# {'p50', 'p95', 'p99', 'max'} in milliseconds over the window, plus total sample count
+	def summary(self):
+		values = self.samples[:min(self.count, len(self.samples))]
+		if not len(values): return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0, 'count': 0}
+		p50, p95, p99 = np.percentile(values, [50, 95, 99])*1000
+		return {'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3), 'max': round(values.max()*1000, 3), 'count': self.count}
+
+#---------------------------------------------------------#
+# rolling timings per pipeline stage (eg: 'read', 'jpeg',
+# 'detector MediaPipe Hands', 'send Video 127.0.0.1:11111').
+# Adding a sample is a perf_counter call and an array
+# write, percentiles are only computed for summary()
+#---------------------------------------------------------#
+class PipelineStats:
+
+	def __init__(self, window=512):
+		self.window = window
+		self.stages = {}
+		self.lock = threading.Lock()
+
+	# add a duration (seconds) to a stage
+	def add(self, stage, seconds):
+		stats = self.stages.get(stage)
+		if stats is None:
+			with self.lock: stats = self.stages.setdefault(stage, RollingStats(self.window))
+		stats.add(seconds)
+
+	# with stats.time('stage'): ...
+	@contextmanager
+	def time(self, stage):
+		start = time.perf_counter()
+		try: yield
+		finally: self.add(stage, time.perf_counter()-start)
+
+	def reset(self):
+		with self.lock: self.stages = {}
+
+	# {stage: {'p50', 'p95', 'p99', 'max', 'count'}}, milliseconds
+	def summary(self):
+		with self.lock: stages = dict(self.stages)
+		return {stage: stats.summary() for stage, stats in sorted(stages.items())}
+
+	# short text table (UI stats panel)
+	def table(self):
+		lines = [f'{"stage (ms)":<34}{"p50":>8}{"p95":>8}{"p99":>8}']
+		for stage, s in self.summary().items():
+			lines.append(f'{stage[:33]:<34}{s["p50"]:>8.2f}{s["p95"]:>8.2f}{s["p99"]:>8.2f}')
+		return '\n'.join(lines)
+
+#---------------------------------------------------------#
+# writes engine.stats_report() to a json file periodically
+# (headless monitoring), on a daemon thread. Also takes a
+# SourceManager (one report per source)
+#---------------------------------------------------------#
+class StatsDumper:
+
+	def __init__(self, engine, path, interval=5.0):
+		self.engine = engine
+		self.path = path
+		self.interval = interval
+		self.stopped = False
+		self.t = threading.Thread(target=self.update, args=(), daemon=True)
+		self.t.start()
+
+	def update(self):
+		while not self.stopped:
+			time.sleep(self.interval)
+			with open(self.path, 'w') as f: json.dump(self.engine.stats_report(), f, indent=4)
+
+	def stop(self):
+		self.stopped = True
@@ -0,0 +1,77 @@
+import time
+from collections import namedtuple
+import numpy as np
+
+# frame a detection was started on
+#   capture_time: capture time of the frame
+#   frame_id:     engine frame id (-1: unknown)
+#   roi:          normalized crop (x0, y0, x1, y1) the detector saw, None = full frame (see roi_tracker.py)
+#   image:        full RGB frame for overlays when the detector only saw a crop, None = detector input
+FrameInfo = namedtuple('FrameInfo', ['capture_time', 'frame_id', 'roi', 'image'])
+
+#---------------------------------------------------------#
+# maps mediapipe timestamps to frame capture times / ids
+# and tracks the (smoothed) time between detections
+#---------------------------------------------------------#
+class DetectionClock:
+
+	def __init__(self, interval=1/30):
+		self.capture_times = {}          # timestamp -> FrameInfo
+		self.capture_time = time.time()  # capture time of the last detection result
+		self.interval = interval         # seconds between detection results
+
+	# frame sent to the detector
+	def start(self, timestamp, capture_time=None, frame_id=-1, roi=None, image=None):
+		self.capture_times[timestamp] = FrameInfo(capture_time if capture_time is not None else time.time(), frame_id, roi, image)
+
+	# detection result arrived, returns the FrameInfo of its frame
+	def finish(self, timestamp):
+		frame = self.capture_times.pop(timestamp, None) or FrameInfo(time.time(), -1, None, None)
+		capture_time = frame.capture_time
+
+		# frames dropped by the detector never come back (list(): start() may add keys from the main thread)
+		for t in [t for t in list(self.capture_times) if t < timestamp]: self.capture_times.pop(t, None)
+
+		dt = capture_time - self.capture_time
+		if 0 < dt < 1: self.interval = 0.8*self.interval + 0.2*dt
+		self.capture_time = capture_time
+		return frame
+
+#---------------------------------------------------------#
+# extrapolates landmarks forward in time to compensate
+# for the pipeline latency (camera -> detection -> send),
+# using the one-euro filtered velocity of each joint
+#---------------------------------------------------------#
+class LatencyPredictor:
+
+	def __init__(self, acceleration=False, min_confidence=0.5, max_latency=0.25, smoothing=0.5):
+		self.acceleration = acceleration      # also extrapolate with (smoothed) joint acceleration
+		self.min_confidence = min_confidence  # no extrapolation at (or below) this confidence
+		self.max_latency = max_latency        # seconds, caps extrapolation
+		self.smoothing = smoothing            # acceleration smoothing (0: none, 1: frozen)
+		self.state = {}                       # key -> [capture_time, velocity, acceleration]
+
+	# landmarks, velocity: (N, J, 3) arrays. confidence: (N,). latency in seconds
+	def __call__(self, keys, landmarks, velocity, confidence, latency, capture_time):
+		if not len(keys): return landmarks
+		latency = min(max(latency, 0.0), self.max_latency)
+
+		# lower confidence, less extrapolation
+		gain = np.clip((np.asarray(confidence) - self.min_confidence)/(1.0 - self.min_confidence), 0.0, 1.0)[:, None, None]
+		offset = velocity*latency
+
+		if self.acceleration:
+			accelerations = []
+			for i, key in enumerate(keys):
+				state = self.state.get(key)
+				if state is None:
+					state = [capture_time, velocity[i], np.zeros_like(velocity[i])]
+				elif capture_time > state[0]:
+					acc = (velocity[i] - state[1])/(capture_time - state[0])
+					state = [capture_time, velocity[i], self.smoothing*state[2] + (1.0-self.smoothing)*acc]
+				self.state[key] = state
+				accelerations.append(state[2])
+			for key in [k for k in self.state.keys() if k not in keys]: del self.state[key]
+			offset = offset + 0.5*np.array(accelerations)*latency**2
+
+		return (landmarks + gain*offset).astype(landmarks.dtype, copy=False)
@@ -0,0 +1,37 @@
+import time, cv2
+import numpy as np
+
+#---------------------------------------------------------#
+# preview texture data for the UI: the displayed image is
+# downscaled to the widget size and converted into a
+# preallocated float32 buffer (dearpygui raw textures are
+# float only), at its own rate, independent of streaming
+#---------------------------------------------------------#
+class PreviewTexture:
+
+	def __init__(self, rate=30, enabled=True):
+		self.rate = rate              # preview updates per second
+		self.enabled = enabled
+		self.target_size = None       # displayed widget size (w, h), None = full size
+		self.buffer = None            # float32 (h, w, 3), reused between updates
+		self.last_time = 0
+
+	# time for a new preview frame?
+	def due(self):
+		return self.enabled and time.time()-self.last_time >= 1/max(self.rate, 0.1)
+
+	# texture size for an image, never larger than the image itself
+	def size_for(self, image):
+		h, w = image.shape[:2]
+		if not self.target_size: return w, h
+		tw = max(1, min(w, int(self.target_size[0])))
+		return tw, max(1, int(round(tw*h/w)))
+
+	# converts an RGB uint8 image into the texture buffer (reallocated only when the size changes)
+	def update(self, image):
+		self.last_time = time.time()
+		w, h = self.size_for(image)
+		if (w, h) != image.shape[1::-1]: image = cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+		if self.buffer is None or self.buffer.shape != (h, w, 3): self.buffer = np.empty((h, w, 3), dtype=np.float32)
+		np.multiply(image, 1/255, out=self.buffer, casting='unsafe')
+		return self.buffer
@@ -1,7 +1,12 @@
 import cv2, mediapipe as mp
 import numpy as np
-import platform
-from one_euro_filter import OneEuroFilter
+import platform, time
+from one_euro_filter import OneEuroFilterBank
+from prediction import DetectionClock
+import landmark_packet
+import roi_tracker
+from result_slot import ResultSlot
+from person_tracker import PersonTracker, person_order
 from mediapipe.framework.formats import landmark_pb2
 from mediapipe import solutions
 from mediapipe.tasks import python as tasks
@@ -9,9 +14,11 @@ from mediapipe.tasks.python import vision
 import resources
 
 class MediaPipe_Faces:
-	def __init__(self, frame_width, frame_height):
+	# running_mode: LIVE_STREAM (async, results on callback thread) or VIDEO (offline, synchronous)
+	# delegate: tasks.BaseOptions.Delegate, None = platform default, max_people: max faces
+	# blendshapes / transform: also output blendshape scores / facial transformation matrices (off = cheaper inference)
+	def __init__(self, frame_width, frame_height, running_mode=vision.RunningMode.LIVE_STREAM, delegate=None, max_people=1, blendshapes=False, transform=False):
 		self.image = None
-		self.display_image = np.zeros((frame_width, frame_height, 3), dtype=np.uint8)
 		self.frame_width=frame_width
 		self.frame_height=frame_height
 		self.iteration = 0
@@ -26,54 +33,70 @@ class MediaPipe_Faces:
 		self.apply_filter = True
 		self.one_euro_min_cutoff = 0.004
 		self.one_euro_beta = 20
-		self.filtered_vals = {}
-		self.mp_data_filter = {}
-		self.running_mode = vision.RunningMode.LIVE_STREAM
-		delegate = tasks.BaseOptions.Delegate.GPU if platform.system()=='Linux' else tasks.BaseOptions.Delegate.CPU
+		self.filter = OneEuroFilterBank(min_cutoff=self.one_euro_min_cutoff, beta=self.one_euro_beta)
+		self.running_mode = running_mode
+		self.max_people = max_people
+		self.tracker = PersonTracker(self.max_people, self.frame_width/self.frame_height)
+		self.blendshapes = blendshapes
+		self.transform = transform
+		if delegate is None: delegate = tasks.BaseOptions.Delegate.GPU if platform.system()=='Linux' else tasks.BaseOptions.Delegate.CPU
 		self.base_options = tasks.BaseOptions(model_asset_path=resources.getPath('mediapipe_models/face_landmarker.task'), delegate=delegate)
 		self.options = vision.FaceLandmarkerOptions(
 			base_options=self.base_options, 
-			output_facial_transformation_matrixes=True, 
+			output_face_blendshapes=self.blendshapes, 
+			output_facial_transformation_matrixes=self.transform, 
 			min_face_detection_confidence=0.8, 
 			min_tracking_confidence=0.5, 
-			num_faces=1, 
+			num_faces=self.max_people, 
 			running_mode=self.running_mode, 
-			result_callback=self.on_detection)
+			result_callback=self.on_detection if self.running_mode==vision.RunningMode.LIVE_STREAM else None)
 		self.detector = vision.FaceLandmarker.create_from_options(self.options)
-		self.joints = {}
+		self.num_joints = 478
+		self.clock = DetectionClock()
+		self.results = ResultSlot(landmark_packet.empty_result(self.num_joints))
 		self.draw_skeleton = False
+		self.callback_time = 0.0  # seconds spent in the last on_detection (stats)
 
 	def on_detection(self, result: vision.FaceLandmarkerResult, output_image: mp.Image, timestamp_ms: int):
+		start_time = time.perf_counter()
 		self.iteration +=1
-		self.joints = {}
+		landmarks = np.empty((len(result.face_landmarks), self.num_joints, 3), dtype=np.float32)
+		confidence = np.ones(len(result.face_landmarks), dtype=np.float32)
+		bounds = np.empty((len(result.face_landmarks), 4), dtype=np.float32)
+		blendshapes = np.zeros((len(result.face_landmarks), len(landmark_packet.BLENDSHAPE_NAMES)), dtype=np.float32) if self.blendshapes else None
+		transforms = np.empty((len(result.face_landmarks), 4, 4), dtype=np.float32) if self.transform else None
+		frame = self.clock.finish(timestamp_ms)
+
+		# overlay is drawn on a copy of the detected frame (the engine may already be on a newer one), full size when the detector only saw a crop
+		display_image = (frame.image if frame.image is not None else output_image.numpy_view()).copy() if self.draw_skeleton and len(result.face_landmarks) else None
 
 		# loop through found faces
 		for i, face_landmarks in enumerate(result.face_landmarks):
 
-			# get landmarks
-			face_world_landmarks = result.facial_transformation_matrixes[i]
+			# get landmarks (normalized to the full frame, the detector may have seen a crop)
+			points = roi_tracker.to_frame(np.float32([[l.x, l.y, l.z] for l in face_landmarks]), frame.roi)
+			bounds[i] = roi_tracker.bounds(points)
 			
 			# draw landmarks over cv image
-			self.display_image = self.image.numpy_view()
-			if self.draw_skeleton:
+			if display_image is not None:
 				face_landmarks_proto = landmark_pb2.NormalizedLandmarkList()
-				face_landmarks_proto.landmark.extend([ landmark_pb2.NormalizedLandmark(x=landmark.x, y=landmark.y, z=landmark.z) for landmark in face_landmarks ])
+				face_landmarks_proto.landmark.extend([ landmark_pb2.NormalizedLandmark(x=x, y=y, z=z) for x, y, z in points.tolist() ])
 				solutions.drawing_utils.draw_landmarks(
-					self.display_image,
+					display_image,
 					face_landmarks_proto,
 					solutions.face_mesh.FACEMESH_TESSELATION,
 					None,
 					solutions.drawing_styles.get_default_face_mesh_tesselation_style()
 					)
 				solutions.drawing_utils.draw_landmarks(
-					self.display_image,
+					display_image,
 					face_landmarks_proto,
 					solutions.face_mesh.FACEMESH_CONTOURS,
 					None,
 					solutions.drawing_styles.get_default_face_mesh_contours_style()
 					)
 				solutions.drawing_utils.draw_landmarks(
-					self.display_image,
+					display_image,
 					face_landmarks_proto,
 					solutions.face_mesh.FACEMESH_IRISES,
 					None,
@@ -81,20 +104,46 @@ class MediaPipe_Faces:
 					)
 			
 			
-			# populate face dict
-			face_name = f'Face{i}'
-			self.joints[face_name] = []
+			# populate face landmarks (and the optional outputs)
+			landmarks[i] = points
+			if blendshapes is not None:
+				for category in result.face_blendshapes[i]: blendshapes[i, category.index] = category.score
+			if transforms is not None: transforms[i] = result.facial_transformation_matrixes[i]
 
-			for lm in face_landmarks:
-				self.joints[face_name].append(
-						{
-							'x':lm.x,
-							'y':lm.y,
-							'z':lm.z,
-						}
-					)
-					
+		# persistent ids ('Face0' keeps its name while tracked), faces ordered by id
+		ids = self.tracker.update(bounds, ['Face']*len(bounds))
+		order = person_order(ids, ['Face']*len(bounds))
+		names = keys = [f'Face{ids[i]}' for i in order]
+		landmarks, confidence, bounds = landmarks[order], confidence[order], bounds[order]
+		if blendshapes is not None: blendshapes = blendshapes[order]
+		if transforms is not None: transforms = transforms[order]
+
+		# one-euro-filter (all faces at once, keyed by person id), its derivative also gives joint velocity for prediction
+		self.filter.min_cutoff = self.one_euro_min_cutoff
+		self.filter.beta = self.one_euro_beta
+		filtered = self.filter(self.iteration, keys, landmarks)
+		velocity = (self.filter.derivative(keys)/self.clock.interval).astype(np.float32)
+		if self.apply_filter: landmarks = filtered
+
+		# publish (people, joints, 3) landmarks
+		self.results.publish(landmark_packet.LandmarkResult(names, keys, landmarks, velocity, confidence, frame.capture_time, frame.frame_id, display_image, bounds, blendshapes, transforms))
+		self.callback_time = time.perf_counter() - start_time
+
+	# latest published result (see result_slot.py)
+	@property
+	def result(self):
+		return self.results.result
+
+	# timestamp: mediapipe timestamp (ms, strictly increasing), capture_time / frame_id: tag the result of this frame
+	# roi: normalized crop of the full frame in self.image (None = full frame), frame: full RGB frame (overlays on crops)
+	def detect(self, timestamp, capture_time=None, frame_id=-1, roi=None, frame=None):
+		self.clock.start(timestamp, capture_time, frame_id, roi, frame)
+		if self.running_mode==vision.RunningMode.LIVE_STREAM:
+			self.detector.detect_async(image=self.image, timestamp_ms=timestamp)
+		else:
+			self.on_detection(self.detector.detect_for_video(image=self.image, timestamp_ms=timestamp), self.image, timestamp)
 
-	def detect(self, timestamp):
-		self.detector.detect_async(image=self.image, timestamp_ms=timestamp)
+	# release the mediapipe graph (threads, gpu context), no LIVE_STREAM callbacks after this
+	def close(self):
+		self.detector.close()
 		
@@ -1,7 +1,12 @@
 import cv2, mediapipe as mp
 import numpy as np
-import platform
-from one_euro_filter import OneEuroFilter
+import platform, time
+from one_euro_filter import OneEuroFilterBank
+from prediction import DetectionClock
+import landmark_packet
+import roi_tracker
+from result_slot import ResultSlot
+from person_tracker import PersonTracker, person_order
 from mediapipe.framework.formats import landmark_pb2
 from mediapipe import solutions
 from mediapipe.tasks import python as tasks
@@ -9,9 +14,10 @@ from mediapipe.tasks.python import vision
 import resources
 
 class MediaPipe_Hands:
-	def __init__(self, frame_width, frame_height):
+	# running_mode: LIVE_STREAM (async, results on callback thread) or VIDEO (offline, synchronous)
+	# delegate: tasks.BaseOptions.Delegate, None = platform default, max_people: max hands
+	def __init__(self, frame_width, frame_height, running_mode=vision.RunningMode.LIVE_STREAM, delegate=None, max_people=2):
 		self.image = None
-		self.display_image = np.zeros((frame_width, frame_height, 3), dtype=np.uint8)
 		self.frame_width=frame_width
 		self.frame_height=frame_height
 		self.iteration = 0
@@ -26,25 +32,39 @@ class MediaPipe_Hands:
 		self.apply_filter = True
 		self.one_euro_min_cutoff = 0.004
 		self.one_euro_beta = 20
-		self.filtered_vals = {}
-		self.mp_data_filter = {}
-		self.running_mode = vision.RunningMode.LIVE_STREAM
-		delegate = tasks.BaseOptions.Delegate.GPU if platform.system()=='Linux' else tasks.BaseOptions.Delegate.CPU
+		self.filter = OneEuroFilterBank(min_cutoff=self.one_euro_min_cutoff, beta=self.one_euro_beta)
+		self.running_mode = running_mode
+		self.max_people = max_people
+		self.tracker = PersonTracker(self.max_people, self.frame_width/self.frame_height)
+		if delegate is None: delegate = tasks.BaseOptions.Delegate.GPU if platform.system()=='Linux' else tasks.BaseOptions.Delegate.CPU
 		self.base_options = tasks.BaseOptions(model_asset_path=resources.getPath('mediapipe_models/hand_landmarker.task'), delegate=delegate)
-		self.options = vision.HandLandmarkerOptions(base_options=self.base_options, min_hand_detection_confidence=0.8, min_tracking_confidence=0.5, num_hands=2, running_mode=self.running_mode, result_callback=self.on_detection)
+		self.options = vision.HandLandmarkerOptions(base_options=self.base_options, min_hand_detection_confidence=0.8, min_tracking_confidence=0.5, num_hands=self.max_people, running_mode=self.running_mode, result_callback=self.on_detection if self.running_mode==vision.RunningMode.LIVE_STREAM else None)
 		self.detector = vision.HandLandmarker.create_from_options(self.options)
-		self.joints = {}
+		self.num_joints = 21
+		self.clock = DetectionClock()
+		self.results = ResultSlot(landmark_packet.empty_result(self.num_joints))
 		self.draw_skeleton = True
+		self.callback_time = 0.0  # seconds spent in the last on_detection (stats)
 
 	def on_detection(self, result: vision.HandLandmarkerResult, output_image: mp.Image, timestamp_ms: int):
+		start_time = time.perf_counter()
 		self.iteration +=1
-		self.joints = {}
+		names = []
+		landmarks = np.empty((len(result.hand_landmarks), self.num_joints, 3), dtype=np.float32)
+		confidence = np.ones(len(result.hand_landmarks), dtype=np.float32)
+		bounds = np.empty((len(result.hand_landmarks), 4), dtype=np.float32)
+		frame = self.clock.finish(timestamp_ms)
+
+		# overlay is drawn on a copy of the detected frame (the engine may already be on a newer one), full size when the detector only saw a crop
+		display_image = (frame.image if frame.image is not None else output_image.numpy_view()).copy() if self.draw_skeleton and len(result.hand_landmarks) else None
 
 		# loop through found hands
 		for i, hand_landmarks in enumerate(result.hand_landmarks):
 
-			# get landmarks
+			# get landmarks (image landmarks normalized to the full frame, the detector may have seen a crop)
 			hand_world_landmarks = result.hand_world_landmarks[i]
+			points = roi_tracker.to_frame(np.float32([[l.x, l.y, l.z] for l in hand_landmarks]), frame.roi)
+			bounds[i] = roi_tracker.bounds(points)
 			handedness = result.handedness[i]
 			
 			###################################################################################################
@@ -53,7 +73,7 @@ class MediaPipe_Hands:
 			# for providing the code: https://github.com/google/mediapipe/issues/2199#issuecomment-1172971018
 			###################################################################################################
 			model_points = np.float32([[-l.x, -l.y, -l.z] for l in hand_world_landmarks])
-			image_points = np.float32([[l.x * self.frame_width, l.y * self.frame_height] for l in hand_landmarks])
+			image_points = points[:, :2]*np.float32([self.frame_width, self.frame_height])
 			success, rotation_vector, translation_vector = cv2.solvePnP(model_points, image_points, self.camera_matrix, self.distortion, flags=cv2.SOLVEPNP_SQPNP)
 			transformation = np.eye(4)
 			transformation[0:3, 3] = translation_vector.squeeze()
@@ -61,51 +81,56 @@ class MediaPipe_Hands:
 			world_points = model_points_hom.dot(np.linalg.inv(transformation).T)
 
 			# draw landmarks over cv image
-			self.display_image = self.image.numpy_view()
-			if self.draw_skeleton:
+			if display_image is not None:
 				hand_landmarks_proto = landmark_pb2.NormalizedLandmarkList()
-				hand_landmarks_proto.landmark.extend([ landmark_pb2.NormalizedLandmark(x=landmark.x, y=landmark.y, z=landmark.z) for landmark in hand_landmarks ])
+				hand_landmarks_proto.landmark.extend([ landmark_pb2.NormalizedLandmark(x=x, y=y, z=z) for x, y, z in points.tolist() ])
 				solutions.drawing_utils.draw_landmarks(
-					self.display_image,
+					display_image,
 					hand_landmarks_proto,
 					solutions.hands.HAND_CONNECTIONS,
 					solutions.drawing_styles.get_default_hand_landmarks_style(),
 					solutions.drawing_styles.get_default_hand_connections_style()
 					)
 			
-			# populate hand dict
-			hand_name = handedness[0].category_name
-			self.joints[hand_name] = []
-			for n, lm in enumerate(world_points):
-				
-				# apply one-euro-filter to smooth signal
-				for m in range(3):
-					self.filtered_vals[f'{hand_name}{n}{m}'] = lm[m]	
+			# populate hand landmarks
+			confidence[i] = handedness[0].score
+			names.append(handedness[0].category_name)
+			landmarks[i] = world_points[:, :3]
+
+		# persistent ids per handedness (a second performer's hands are 'Left1' / 'Right1'), hands ordered by id
+		labels = names
+		ids = self.tracker.update(bounds, labels)
+		order = person_order(ids, labels)
+		keys = [f'{labels[i]}{ids[i]}' for i in order]
+		names = [labels[i] if ids[i]==0 else keys[n] for n, i in enumerate(order)]
+		landmarks, confidence, bounds = landmarks[order], confidence[order], bounds[order]
+
+		# one-euro-filter (all hands at once, keyed by person id), its derivative also gives joint velocity for prediction
+		self.filter.min_cutoff = self.one_euro_min_cutoff
+		self.filter.beta = self.one_euro_beta
+		filtered = self.filter(self.iteration, keys, landmarks)
+		velocity = (self.filter.derivative(keys)/self.clock.interval).astype(np.float32)
+		if self.apply_filter: landmarks = filtered
+
+		# publish (people, joints, 3) landmarks
+		self.results.publish(landmark_packet.LandmarkResult(names, keys, landmarks, velocity, confidence, frame.capture_time, frame.frame_id, display_image, bounds))
+		self.callback_time = time.perf_counter() - start_time
 
-					if self.apply_filter:
-						if f'{hand_name}{n}{m}' not in self.mp_data_filter.keys():
-							self.mp_data_filter[f'{hand_name}{n}{m}'] = OneEuroFilter(self.iteration, lm[m], min_cutoff=self.one_euro_min_cutoff, beta=self.one_euro_beta)
-							self.filtered_vals[f'{hand_name}{n}{m}'] = lm[m]							
-						else:
-							try:
-								self.filtered_vals[f'{hand_name}{n}{m}'] = self.mp_data_filter[f'{hand_name}{n}{m}'](self.iteration, lm[m])
-								if np.isnan(self.filtered_vals[f'{hand_name}{n}{m}']):
-									self.mp_data_filter[f'{hand_name}{n}{m}'] = OneEuroFilter(self.iteration, lm[m], min_cutoff=self.one_euro_min_cutoff, beta=self.one_euro_beta)
-									self.filtered_vals[f'{hand_name}{n}{m}'] = lm[m]	
-							except:
-								self.filtered_vals[f'{hand_name}{n}{m}'] = lm[m]	
+	# latest published result (see result_slot.py)
+	@property
+	def result(self):
+		return self.results.result
 
-				# set dict
-				self.joints[hand_name].append(
-					{
-						'x':self.filtered_vals[f'{hand_name}{n}0'],
-						'y':self.filtered_vals[f'{hand_name}{n}1'],
-						'z':self.filtered_vals[f'{hand_name}{n}2'],
-					}
-				)
-				
-				
+	# timestamp: mediapipe timestamp (ms, strictly increasing), capture_time / frame_id: tag the result of this frame
+	# roi: normalized crop of the full frame in self.image (None = full frame), frame: full RGB frame (overlays on crops)
+	def detect(self, timestamp, capture_time=None, frame_id=-1, roi=None, frame=None):
+		self.clock.start(timestamp, capture_time, frame_id, roi, frame)
+		if self.running_mode==vision.RunningMode.LIVE_STREAM:
+			self.detector.detect_async(image=self.image, timestamp_ms=timestamp)
+		else:
+			self.on_detection(self.detector.detect_for_video(image=self.image, timestamp_ms=timestamp), self.image, timestamp)
 
-	def detect(self, timestamp):
-		self.detector.detect_async(image=self.image, timestamp_ms=timestamp)
+	# release the mediapipe graph (threads, gpu context), no LIVE_STREAM callbacks after this
+	def close(self):
+		self.detector.close()
 		
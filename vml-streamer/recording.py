@@ -0,0 +1,224 @@
+import os, struct, json, time, socket, threading
+import numpy as np
+
+#---------------------------------------------------------#
+# Stream recording file (.vmlr): the exact payloads sent
+# to every stream, with their capture times, so a take
+# can be replayed without running any detection.
+#
+#   header:   magic b'VMLR', version B, 3 reserved bytes
+#   records:  time d (seconds, relative to the first record)
+#             frame_id I, stream H (index in the stream
+#             table), size I, then the payload bytes
+#   footer:   index (record times float64, offsets uint64,
+#             stream ids uint16), json meta (stream table,
+#             start time), trailer
+#   trailer:  count Q, index offset Q, meta offset Q, magic
+#
+# Recordings that were not closed (crash) have no footer,
+# their index is rebuilt by scanning the records. Record
+# times are capture times: with several sources they are
+# not monotonic in file order, readers sort the index.
+#---------------------------------------------------------#
+
+MAGIC    = b'VMLR'
+VERSION  = 1
+HEADER   = struct.Struct('<4sB3x')
+RECORD   = struct.Struct('<dIHI')
+TRAILER  = struct.Struct('<QQQ4s')
+EXTENSION = 'vmlr'
+
+# default recording path (user home), one file per take
+def default_path(folder='~/vml_recordings'):
+	folder = os.path.expanduser(folder)
+	os.makedirs(folder, exist_ok=True)
+	return os.path.join(folder, time.strftime(f'take_%Y%m%d_%H%M%S.{EXTENSION}'))
+
+#---------------------------------------------------------#
+# appends outgoing payloads to a recording file, can be
+# shared by the engines of several sources (thread safe)
+#---------------------------------------------------------#
+class Recorder:
+
+	def __init__(self, path):
+		self.path = path
+		self.file = open(path, 'wb')
+		self.file.write(HEADER.pack(MAGIC, VERSION))
+		self.start_time = None
+		self.streams = {}    # (type, address, port) -> stream id
+		self.times = []
+		self.offsets = []
+		self.stream_ids = []
+		self.lock = threading.Lock()
+
+	@property
+	def count(self):
+		return len(self.times)
+
+	# record a payload sent to a stream (dict with type, address and port)
+	def write(self, stream, payload, capture_time, frame_id=0):
+		key = (stream['type'], stream['address'], stream['port'])
+		with self.lock:
+			if self.file.closed: return
+			stream_id = self.streams.setdefault(key, len(self.streams))
+			if self.start_time is None: self.start_time = capture_time
+			t = capture_time - self.start_time
+
+			self.times.append(t)
+			self.offsets.append(self.file.tell())
+			self.stream_ids.append(stream_id)
+			self.file.write(RECORD.pack(t, frame_id & 0xFFFFFFFF, stream_id, len(payload)))
+			self.file.write(payload)
+
+	def close(self):
+		with self.lock: self._close()
+
+	def _close(self):
+		if self.file.closed: return
+		index_offset = self.file.tell()
+		self.file.write(np.asarray(self.times, dtype='<f8').tobytes())
+		self.file.write(np.asarray(self.offsets, dtype='<u8').tobytes())
+		self.file.write(np.asarray(self.stream_ids, dtype='<u2').tobytes())
+
+		meta_offset = self.file.tell()
+		meta = {
+			'start_time': self.start_time,
+			'streams': [{'type': k[0], 'address': k[1], 'port': k[2]} for k in sorted(self.streams, key=self.streams.get)],
+		}
+		self.file.write(json.dumps(meta).encode())
+		self.file.write(TRAILER.pack(self.count, index_offset, meta_offset, MAGIC))
+		self.file.close()
+
+#---------------------------------------------------------#
+# read only access to a recording (memory mapped)
+#---------------------------------------------------------#
+class Recording:
+
+	def __init__(self, path):
+		self.path = path
+		self.data = np.memmap(path, dtype=np.uint8, mode='r')
+		magic, version = HEADER.unpack_from(self.data)
+		if magic != MAGIC: raise ValueError('Not a VML Streamer recording')
+		if version != VERSION: raise ValueError(f'Unsupported recording version: {version}')
+
+		count, index_offset, meta_offset, magic = TRAILER.unpack_from(self.data, len(self.data)-TRAILER.size) if len(self.data) >= HEADER.size+TRAILER.size else (0, 0, 0, b'')
+		if magic == MAGIC:
+			self.times      = np.frombuffer(self.data, dtype='<f8', count=count, offset=index_offset)
+			self.offsets    = np.frombuffer(self.data, dtype='<u8', count=count, offset=index_offset+count*8)
+			self.stream_ids = np.frombuffer(self.data, dtype='<u2', count=count, offset=index_offset+count*16)
+			self.meta = json.loads(bytes(self.data[meta_offset:len(self.data)-TRAILER.size]))
+		else:
+			self.scan()
+		self.sort()
+
+	# index in time order (sources sharing a recorder interleave their capture times), stable for equal times.
+	# Records captured before the first one written move the start back, times stay >= 0
+	def sort(self):
+		if np.all(self.times[1:] >= self.times[:-1]): return
+		order = np.argsort(self.times, kind='stable')
+		self.times, self.offsets, self.stream_ids = self.times[order], self.offsets[order], self.stream_ids[order]
+		if self.times[0] < 0:
+			if self.meta['start_time'] is not None: self.meta['start_time'] += float(self.times[0])
+			self.times = self.times - self.times[0]
+
+	# rebuild the index of an unfinished recording, stream table is unknown (stream ids only)
+	def scan(self):
+		times, offsets, stream_ids = [], [], []
+		offset = HEADER.size
+		while offset + RECORD.size <= len(self.data):
+			t, frame_id, stream_id, size = RECORD.unpack_from(self.data, offset)
+			if offset + RECORD.size + size > len(self.data): break
+			times.append(t)
+			offsets.append(offset)
+			stream_ids.append(stream_id)
+			offset += RECORD.size + size
+		self.times      = np.asarray(times, dtype='<f8')
+		self.offsets    = np.asarray(offsets, dtype='<u8')
+		self.stream_ids = np.asarray(stream_ids, dtype='<u2')
+		self.meta = {'start_time': None, 'streams': [{'type': None, 'address': None, 'port': None} for _ in range(int(self.stream_ids.max())+1 if len(stream_ids) else 0)]}
+
+	def __len__(self):
+		return len(self.times)
+
+	@property
+	def streams(self):
+		return self.meta['streams']
+
+	@property
+	def duration(self):
+		return float(self.times[-1]) if len(self.times) else 0.0
+
+	# payload of record i (memoryview over the mapped file, no copy)
+	def payload(self, i):
+		offset = int(self.offsets[i])
+		t, frame_id, stream_id, size = RECORD.unpack_from(self.data, offset)
+		start = offset + RECORD.size
+		return memoryview(self.data[start:start+size])
+
+	# first record at or after time t (seconds)
+	def find(self, t):
+		return int(np.searchsorted(self.times, t, side='left'))
+
+#---------------------------------------------------------#
+# sends recorded payloads to their original destinations
+# (or overrides) with the original timing, at any speed.
+# Sleeps until the next record is due, so cpu cost is
+# just the sendto calls.
+#---------------------------------------------------------#
+class Player:
+
+	def __init__(self, recording, speed=1.0, loop=False, destinations=None):
+		self.recording = recording
+		self.speed = speed
+		self.loop = loop
+		self.stopped = False
+		self.skt = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+		try: self.skt.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4*1024*1024)
+		except OSError: pass
+
+		# stream id -> (address, port), destinations can override them by stream id
+		self.destinations = [(s['address'], s['port']) for s in recording.streams]
+		for stream_id, addr_port in (destinations or {}).items(): self.destinations[stream_id] = addr_port
+
+		self.position = 0     # next record
+		self.rebase = False   # position changed, restart timing from it
+		self.sent = 0
+
+	# jump to time t (seconds from the start of the recording), can be called while running
+	def seek(self, t):
+		self.position = self.recording.find(t)
+		self.rebase = True
+
+	def stop(self):
+		self.stopped = True
+
+	# replay from the current position until the end (or forever when looping)
+	def run(self, start=0.0, end=None):
+		rec = self.recording
+		if not len(rec): return
+		end_index = rec.find(end) if end is not None else len(rec)
+		self.seek(start)
+
+		while not self.stopped:
+			if self.position >= end_index:
+				if not self.loop: break
+				self.seek(start)
+
+			# wall clock time of the current position
+			self.rebase = False
+			base_time = float(rec.times[self.position])
+			base_clock = time.perf_counter()
+
+			while not self.stopped and not self.rebase and self.position < end_index:
+				due = base_clock + (float(rec.times[self.position]) - base_time)/self.speed
+				wait = due - time.perf_counter()
+				if wait > 0: time.sleep(min(wait, 0.1))  # short naps, stays responsive to seek / stop
+
+				# send every record due by now
+				now = time.perf_counter()
+				while not self.rebase and self.position < end_index and base_clock + (float(rec.times[self.position]) - base_time)/self.speed <= now:
+					stream_id = int(rec.stream_ids[self.position])
+					addr_port = self.destinations[stream_id]
+					if addr_port[0] is not None: self.skt.sendto(rec.payload(self.position), addr_port)
+					self.position += 1
+					self.sent += 1
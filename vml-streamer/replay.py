@@ -0,0 +1,58 @@
+import sys, argparse, threading
+from recording import Recording, Player
+
+#---------------------------------------------------------#
+# replay a recorded take (.vmlr) to the original streams,
+# no video source or detection involved
+#
+#   python replay.py take.vmlr --speed 2 --loop
+#   python replay.py take.vmlr --dest 1=192.168.0.20:11112
+#---------------------------------------------------------#
+
+# "stream_id=address:port"
+def parse_destination(value):
+	try:
+		stream_id, addr_port = value.split('=', 1)
+		address, port = addr_port.rsplit(':', 1)
+		return int(stream_id), (address, int(port))
+	except ValueError:
+		raise argparse.ArgumentTypeError(f'expected stream_id=address:port, got "{value}"')
+
+def main():
+	parser = argparse.ArgumentParser(description='VML Streamer replay')
+	parser.add_argument('recording', help='recorded take (.vmlr)')
+	parser.add_argument('--speed', type=float, default=1.0, help='playback speed multiplier')
+	parser.add_argument('--loop', action='store_true', help='loop playback')
+	parser.add_argument('--start', type=float, default=0.0, help='start time (seconds)')
+	parser.add_argument('--end', type=float, default=None, help='end time (seconds)')
+	parser.add_argument('--dest', type=parse_destination, action='append', default=[], help='send a stream somewhere else: stream_id=address:port (can be repeated)')
+	args = parser.parse_args()
+
+	try: recording = Recording(args.recording)
+	except (OSError, ValueError) as e:
+		print(f'Could not open recording "{args.recording}": {e}', file=sys.stderr)
+		return 1
+
+	if args.speed <= 0:
+		print('Speed must be greater than 0', file=sys.stderr)
+		return 1
+
+	player = Player(recording, speed=args.speed, loop=args.loop, destinations=dict(args.dest))
+	print(f'{len(recording)} payloads, {recording.duration:.1f}s:')
+	for stream_id, (stream, (address, port)) in enumerate(zip(recording.streams, player.destinations)):
+		print(f'  [{stream_id}] {stream["type"] or "unknown stream"} -> {address}:{port}')
+	if any(address is None for address, port in player.destinations):
+		print('Recording was not closed properly, stream destinations are unknown (use --dest)', file=sys.stderr)
+
+	print('Replaying, press CTRL+C to stop.')
+	thread = threading.Thread(target=player.run, args=(args.start, args.end), daemon=True)
+	thread.start()
+	try:
+		while thread.is_alive(): thread.join(0.5)
+	except KeyboardInterrupt: player.stop()
+
+	print(f'{player.sent} payloads sent.')
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
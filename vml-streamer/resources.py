@@ -1,6 +1,5 @@
 import sys
 from pathlib import Path
-import dearpygui.dearpygui as dpg
 
 #---------------------------------------------------------#
 # this is to facilitate building binaries with pyinstaller
@@ -14,7 +13,8 @@ def getPath(relative_path):
 	resource_path = f'{str(bundle_dir)}/{relative_path}'
 	return resource_path
 
-# register a new icon texture
+# register a new icon texture (dearpygui is only imported here, detectors and headless runs use getPath without a UI)
 def add_icon(icon_name):
+	import dearpygui.dearpygui as dpg
 	width, height, channels, data = dpg.load_image(getPath(f'images/{icon_name}.png'))
 	dpg.add_static_texture(width=width, height=height, default_value=data, tag=icon_name, parent='treg')
\ No newline at end of file
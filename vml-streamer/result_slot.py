@@ -0,0 +1,37 @@
+import threading, time
+
+# how a stream consumes detection results
+RESULT_LATEST = 'Latest'      # newest result on every frame (may repeat an older detection)
+RESULT_FRESH  = 'Fresh only'  # only results not sent to this stream yet
+RESULT_WAIT   = 'Wait'        # wait up to 'waitMs' for the result of the last detection started, then latest
+RESULT_MODES  = [RESULT_LATEST, RESULT_FRESH, RESULT_WAIT]
+
+#---------------------------------------------------------#
+# latest detection result of a detector. The detector
+# thread (mediapipe callback / process reader) publishes
+# a new immutable LandmarkResult by swapping a single
+# reference, readers never lock and never see a half
+# updated result. The condition is only used by readers
+# waiting for the result of a given frame.
+#---------------------------------------------------------#
+class ResultSlot:
+
+	def __init__(self, result):
+		self.result = result
+		self.condition = threading.Condition()
+
+	def publish(self, result):
+		self.result = result
+		with self.condition: self.condition.notify_all()
+
+	# result of frame_id (or newer), the latest one if it doesn't arrive within timeout seconds
+	def wait(self, frame_id, timeout):
+		result = self.result
+		if result.frame_id >= frame_id or timeout <= 0: return result
+		deadline = time.perf_counter() + timeout
+		with self.condition:
+			while self.result.frame_id < frame_id:
+				remaining = deadline - time.perf_counter()
+				if remaining <= 0: break
+				self.condition.wait(remaining)
+			return self.result
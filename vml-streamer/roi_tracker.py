@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+# pixel box (x0, y0, x1, y1) of a normalized roi in an image of shape (h, w, ...)
+def crop_box(roi, shape):
+	h, w = shape[:2]
+	x0, y0 = int(roi[0]*w), int(roi[1]*h)
+	return x0, y0, max(x0+1, int(np.ceil(roi[2]*w))), max(y0+1, int(np.ceil(roi[3]*h)))
+
+# normalized roi aligned to the pixels of an image of shape (h, w, ...), what the detector actually sees
+def aligned_roi(roi, shape):
+	if roi is None: return None
+	h, w = shape[:2]
+	x0, y0, x1, y1 = crop_box(roi, shape)
+	return (x0/w, y0/h, x1/w, y1/h)
+
+# crop an RGB frame to roi (normalized x0, y0, x1, y1, None = full frame), downscaled to max_size pixels on its
+# long side (0 = never). Returns the detector input (a new contiguous array when cropped) and aligned_roi()
+def crop(image, roi, max_size=0):
+	if roi is None: return image, None
+	x0, y0, x1, y1 = crop_box(roi, image.shape)
+	cropped = image[y0:y1, x0:x1]
+	scale = max_size/max(cropped.shape[:2]) if max_size else 1
+	if scale < 1: cropped = cv2.resize(cropped, (max(1, round(cropped.shape[1]*scale)), max(1, round(cropped.shape[0]*scale))), interpolation=cv2.INTER_AREA)
+	else: cropped = cropped.copy()
+	return cropped, aligned_roi(roi, image.shape)
+
+# normalized landmarks (N, 3) of a crop to full frame normalized coordinates (z is relative to the image width, like x)
+def to_frame(points, roi):
+	if roi is None: return points
+	x0, y0, x1, y1 = roi
+	return points*np.float32([x1-x0, y1-y0, x1-x0]) + np.float32([x0, y0, 0])
+
+# normalized (x0, y0, x1, y1) bounding box of image landmarks (N, 3)
+def bounds(points):
+	return np.concatenate((points[:, :2].min(axis=0), points[:, :2].max(axis=0)))
+
+#---------------------------------------------------------#
+# region of interest tracking: the next detector input is
+# a padded crop around the people found in the last
+# result (result.bounds), instead of the full frame.
+# The crop only moves when people get close to its border
+# (mediapipe's own tracking works on a stable image),
+# and detection falls back to the full frame when nobody
+# is found, or periodically while fewer people than the
+# detector maximum are tracked (someone may have entered).
+#---------------------------------------------------------#
+class RoiTracker:
+
+	def __init__(self, padding=0.5, margin=0.1, min_size=0.1, search_interval=30):
+		self.padding = padding                  # crop margin around the tracked people (fraction of their size)
+		self.margin = margin                    # move the crop when people get this close to its border (fraction of the crop size)
+		self.min_size = min_size                # smallest crop (fraction of the frame long side)
+		self.search_interval = search_interval  # results between full frame searches while not all people are tracked
+		self.roi = None                         # normalized (x0, y0, x1, y1), None = full frame
+		self.result = None
+		self.since_search = 0
+
+	# new detection result (result.bounds: full frame normalized boxes), updates the crop
+	def update(self, result, frame_width, frame_height, max_people=None):
+		if result is self.result: return
+		self.result = result
+		self.since_search += 1
+
+		# tracking lost (or time for a full frame search)
+		if result.bounds is None or not len(result.bounds):
+			self.roi = None
+			return
+		if (max_people is None or len(result.bounds) < max_people) and self.since_search >= self.search_interval:
+			self.roi = None
+			self.since_search = 0
+			return
+
+		x0, y0 = result.bounds[:, :2].min(axis=0)
+		x1, y1 = result.bounds[:, 2:].max(axis=0)
+
+		# keep the current crop while everybody is well inside it
+		if self.roi is not None:
+			rx0, ry0, rx1, ry1 = self.roi
+			mx, my = self.margin*(rx1-rx0), self.margin*(ry1-ry0)
+			inside = x0 >= rx0+mx and y0 >= ry0+my and x1 <= rx1-mx and y1 <= ry1-my
+			if inside and (x1-x0)*(y1-y0) > 0.1*(rx1-rx0)*(ry1-ry0): return
+
+		# square crop in pixels around the people, padded, shifted to stay inside the frame
+		size = max((x1-x0)*frame_width, (y1-y0)*frame_height)
+		size = max(size*(1+2*self.padding), self.min_size*max(frame_width, frame_height))
+		w, h = min(1.0, size/frame_width), min(1.0, size/frame_height)
+		cx, cy = (x0+x1)/2, (y0+y1)/2
+		rx0, ry0 = min(max(cx-w/2, 0.0), 1.0-w), min(max(cy-h/2, 0.0), 1.0-h)
+		self.roi = None if w*h >= 0.9 else (float(rx0), float(ry0), float(rx0+w), float(ry0+h))
+
+	def reset(self):
+		self.roi = None
+		self.result = None
+		self.since_search = 0
@@ -0,0 +1,206 @@
+import time
+
+#---------------------------------------------------------#
+# events per second, over ~1 second windows
+#---------------------------------------------------------#
+class RateMeter:
+
+	def __init__(self, window=1.0):
+		self.window = window
+		self.count = 0
+		self.start = time.perf_counter()
+		self.rate = 0.0
+
+	def tick(self, now):
+		self.count += 1
+		self.update(now)
+
+	# close the window when due (also called without events, so an idle meter drops to 0)
+	def update(self, now):
+		elapsed = now - self.start
+		if elapsed >= self.window:
+			self.rate = self.count/elapsed
+			self.count = 0
+			self.start = now
+
+#---------------------------------------------------------#
+# fixed rate deadlines: due() when the next period starts,
+# with half a source frame of slack (a 15 Hz target on a
+# 30 fps camera runs every other frame, despite jitter)
+#---------------------------------------------------------#
+class RateGate:
+
+	def __init__(self):
+		self.next_due = 0.0
+
+	# rate: Hz (0 = always), slack: seconds
+	def due(self, rate, now, slack=0.0):
+		return rate <= 0 or now + slack >= self.next_due
+
+	def ran(self, rate, now):
+		if rate <= 0: return
+		period = 1/rate
+		self.next_due = self.next_due + period if now - self.next_due < period else now + period
+
+#---------------------------------------------------------#
+# decides, per source frame, which detectors run:
+#   - each detector runs at the highest target rate of
+#     its streams ('rate', 0 = every frame), never with
+#     a detection already in flight (unless it is older
+#     than the latency budget: dropped by mediapipe)
+#   - when the machine falls behind (a detector misses
+#     the smallest 'latencyBudget' of its streams, or
+#     frames take longer than the camera interval) the
+#     lowest 'priority' detectors are slowed down first,
+#     one step at a time. They recover, highest priority
+#     first, once everything is back within budget.
+#---------------------------------------------------------#
+class DetectionScheduler:
+
+	def __init__(self, adjust_interval=0.5, min_scale=0.1, shed_step=0.75):
+		self.adjust_interval = adjust_interval  # seconds between load shedding / recovery steps
+		self.min_scale = min_scale              # slowest a detector gets, fraction of its target rate
+		self.shed_step = shed_step              # rate scale multiplier per shedding step
+		self.detectors = {}                     # detector type -> schedule state (see configure)
+		self.stream_gates = {}                  # stream index -> RateGate
+		self.stream_meters = {}                 # stream label -> RateMeter (sends)
+		self.streams = None
+		self.frame_interval = 1/30              # smoothed time between source frames
+		self.frame_duration = 0.0               # smoothed processing time per frame
+		self.last_frame = None
+		self.last_adjust = 0.0
+
+	# targets per detector from the stream settings (only recomputed when the stream list changes)
+	def configure(self, streams, detector_types):
+		if streams is self.streams: return
+		self.streams = streams
+		for stype in detector_types:
+			users = [s for s in streams if s['type'] == stype]
+			state = self.detectors.get(stype)
+			if state is None:
+				state = self.detectors[stype] = {'scale': 1.0, 'gate': RateGate(), 'latency': 0.0, 'submitted': (-1, 0.0), 'runs': RateMeter(), 'results': RateMeter()}
+			state['active'] = len(users) > 0
+			if not users: continue
+			rates = [s['rate'] for s in users]
+			state['target'] = 0 if 0 in rates else max(rates)
+			state['budget'] = min(s['latencyBudget'] for s in users)/1000
+			state['priority'] = max(s['priority'] for s in users)
+
+	def streams_changed(self):
+		self.streams = None
+		self.stream_gates = {}
+		self.stream_meters = {}
+
+	# new source frame (before detections)
+	def frame_started(self, now):
+		if self.last_frame is not None:
+			dt = now - self.last_frame
+			if 0 < dt < 1: self.frame_interval = 0.9*self.frame_interval + 0.1*dt
+		self.last_frame = now
+
+	# source frame processed, duration in seconds
+	def frame_done(self, duration):
+		self.frame_duration = 0.9*self.frame_duration + 0.1*duration
+
+	# detector rate after load shedding (Hz, 0 = every frame)
+	def scheduled_rate(self, state):
+		if state['scale'] >= 1: return state['target']
+		full_rate = state['target'] if state['target'] > 0 else 1/self.frame_interval
+		return full_rate*state['scale']
+
+	# should this detector run on this frame? result: its latest result
+	def due(self, stype, result, now):
+		state = self.detectors[stype]
+		frame_id, submitted = state['submitted']
+		if result.frame_id < frame_id and now - submitted < state['budget']: return False
+		return state['gate'].due(self.scheduled_rate(state), now, self.frame_interval/2)
+
+	# frame id of the last detection started on this detector (-1: none)
+	def last_submitted(self, stype):
+		state = self.detectors.get(stype)
+		return state['submitted'][0] if state is not None else -1
+
+	def submitted(self, stype, frame_id, now):
+		state = self.detectors[stype]
+		state['submitted'] = (frame_id, now)
+		state['gate'].ran(self.scheduled_rate(state), now)
+		state['runs'].tick(now)
+
+	# new detection result, latency: seconds from capture until the engine saw it
+	def result(self, stype, latency, now):
+		state = self.detectors.get(stype)
+		if state is None: return
+		state['latency'] = 0.8*state['latency'] + 0.2*latency
+		state['results'].tick(now)
+
+	# load shedding / recovery step
+	def adjust(self, now):
+		if now - self.last_adjust < self.adjust_interval: return
+		self.last_adjust = now
+		active = [state for state in self.detectors.values() if state['active']]
+		if not active: return
+
+		behind = [state for state in active if state['latency'] > state['budget']]
+		if self.frame_duration > self.frame_interval: behind = active  # can't keep up with the camera
+		if behind:
+			# slow down the lowest priority detector (never one above the priority of those behind)
+			max_priority = max(state['priority'] for state in behind)
+			candidates = [state for state in active if state['scale'] > self.min_scale and state['priority'] <= max_priority]
+			if candidates:
+				state = min(candidates, key=lambda state: state['priority'])
+				state['scale'] = max(self.min_scale, state['scale']*self.shed_step)
+		else:
+			shed = [state for state in active if state['scale'] < 1]
+			if shed:
+				state = max(shed, key=lambda state: state['priority'])
+				state['scale'] = min(1.0, state['scale']/self.shed_step)
+
+	# should stream i send on this frame? (its own 'rate', independent of the detector rate)
+	def stream_due(self, i, rate, now):
+		gate = self.stream_gates.get(i)
+		if gate is None: gate = self.stream_gates[i] = RateGate()
+		return gate.due(rate, now, self.frame_interval/2)
+
+	def stream_sent(self, i, label, rate, now):
+		self.stream_gates[i].ran(rate, now)
+		meter = self.stream_meters.get(label)
+		if meter is None: meter = self.stream_meters[label] = RateMeter()
+		meter.tick(now)
+
+	# chosen (after load shedding) and achieved rates per detector and per stream
+	def report(self, stream_labels):
+		now = time.perf_counter()
+		detectors = {}
+		for stype, state in self.detectors.items():
+			if not state['active']: continue
+			for meter in (state['runs'], state['results']): meter.update(now)
+			detectors[stype] = {
+				'target': state['target'],
+				'scheduled': round(self.scheduled_rate(state), 2),
+				'runs': round(state['runs'].rate, 2),
+				'results': round(state['results'].rate, 2),
+				'latency_ms': round(state['latency']*1000, 2),
+				'budget_ms': round(state['budget']*1000, 2),
+				'priority': state['priority'],
+				'scale': round(state['scale'], 3),
+			}
+		streams = {}
+		for label, stream in stream_labels.items():
+			meter = self.stream_meters.get(label)
+			if meter is not None: meter.update(now)
+			rates = [rate for rate in (stream['rate'], detectors.get(stream['type'], {}).get('scheduled', 0)) if rate > 0]
+			streams[label] = {
+				'target': stream['rate'],
+				'scheduled': min(rates) if rates else 0,
+				'achieved': round(meter.rate, 2) if meter is not None else 0.0,
+			}
+		return {'frame_interval_ms': round(self.frame_interval*1000, 2), 'frame_duration_ms': round(self.frame_duration*1000, 2), 'detectors': detectors, 'streams': streams}
+
+# short text table of a report() (UI stats panel), 0 Hz = every frame
+def rates_table(report):
+	lines = [f'{"rates (Hz)":<34}{"target":>8}{"sched":>8}{"actual":>8}']
+	for stype, d in report['detectors'].items():
+		lines.append(f'{stype[:33]:<34}{d["target"]:>8.1f}{d["scheduled"]:>8.1f}{d["results"]:>8.1f}')
+	for label, s in report['streams'].items():
+		lines.append(f'  {label[:31]:<32}{s["target"]:>8.1f}{s["scheduled"]:>8.1f}{s["achieved"]:>8.1f}')
+	return '\n'.join(lines)
@@ -0,0 +1,86 @@
+import os
+os.environ.setdefault('OPENCV_IO_ENABLE_OPENEXR', '1')  # must be set before opencv reads the first exr
+import cv2, threading, numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import fileseq
+
+# image formats readable as a sequence (opencv imread decoders, no dpx)
+SEQUENCE_FORMATS = ['exr', 'png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp']
+
+# is path an image (or image sequence pattern)
+def is_sequence_path(path):
+	return str(path).lower().rsplit('.', 1)[-1] in SEQUENCE_FORMATS
+
+# list all frame files of a sequence from a pattern (eg: "plate.1001-1100#.exr") or from any single frame path
+def find_sequence_files(path):
+	seq = fileseq.FileSequence(path)
+	frame_set = seq.frameSet()
+	if frame_set is None or len(frame_set)<=1:
+		try: seq = fileseq.findSequenceOnDisk(f'{seq.dirname()}{seq.basename()}@{seq.extension()}')
+		except fileseq.FileSeqException: return [path] if os.path.isfile(path) else []
+	return list(seq)
+
+# read an image file as 8 bit BGR (float exr/hdr is gamma corrected, 16 bit is scaled down)
+def read_image(path):
+	img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+	if img is None: return None
+
+	if img.ndim==2: img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+	elif img.shape[2]==4: img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+
+	if img.dtype==np.uint16: img = (img >> 8).astype(np.uint8)
+	elif img.dtype in (np.float16, np.float32, np.float64):
+		img = np.clip(np.power(np.clip(img, 0, None, dtype=np.float32), 1/2.2)*255.0, 0, 255).astype(np.uint8)
+	return img
+
+#---------------------------------------------------------#
+# decodes sequence frames on a thread pool into a bounded
+# read-ahead buffer (opencv releases the GIL while decoding)
+#---------------------------------------------------------#
+class SequenceReader:
+
+	def __init__(self, path, workers=None, read_ahead=None):
+		self.path = path
+		self.files = find_sequence_files(path)
+		self.workers = workers or min(8, os.cpu_count() or 1)
+		self.read_ahead = read_ahead or self.workers*2
+		self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sequence_reader')
+		self.buffer = {}  # frame index -> future
+		self.lock = threading.Lock()
+
+	@property
+	def frames(self):
+		return len(self.files)
+
+	def isOpened(self):
+		return self.frames > 0
+
+	# decoded frame (BGR uint8) at index, schedules decoding of the next frames
+	def read(self, index):
+		if not self.files: return False, None
+		index = int(index) % self.frames
+		with self.lock:
+
+			# drop frames outside the read-ahead window (eg: after seeking)
+			window = [(index+i) % self.frames for i in range(min(self.read_ahead, self.frames))]
+			in_window = set(window)
+			for f in [f for f in self.buffer.keys() if f not in in_window]:
+				self.buffer.pop(f).cancel()
+
+			# schedule read-ahead
+			for f in window:
+				if f not in self.buffer: self.buffer[f] = self.pool.submit(read_image, self.files[f])
+			future = self.buffer[index]
+
+		frame = future.result()
+		return frame is not None, frame
+
+	# read-ahead already happens on the thread pool, nothing to do on the calling thread
+	def prefetch(self, index):
+		return False
+
+	def release(self):
+		with self.lock:
+			for future in self.buffer.values(): future.cancel()
+			self.buffer = {}
+		self.pool.shutdown(wait=False)
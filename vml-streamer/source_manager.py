@@ -0,0 +1,148 @@
+import sys, threading, time, traceback
+from video_stream import VideoStream
+from stream_engine import StreamEngine
+from udp_sender import UdpSender
+from recording import Recorder
+
+#---------------------------------------------------------#
+# one video source: its VideoStream (capture thread) and
+# its StreamEngine (detectors, filters, scheduler), run
+# on a thread of its own. Reads the streams whose
+# 'source' is its index.
+#---------------------------------------------------------#
+class Source:
+
+	def __init__(self, index, vs, engine):
+		self.index = index
+		self.vs = vs
+		self.engine = engine
+		self.thread = None
+		self.error = None       # exception that stopped the engine thread
+		self.all_streams = None
+		self.own_streams = ()
+
+	# streams of this source, only filtered again when the stream list changes
+	def streams(self, streams):
+		if streams is not self.all_streams:
+			self.all_streams = streams
+			self.own_streams = tuple(s for s in streams if s.get('source', 0) == self.index)
+		return self.own_streams
+
+	# streams: stream list, or a function returning the current one (all sources)
+	def start(self, streams, stop_at_end=True):
+		get_streams = (lambda: self.streams(streams())) if callable(streams) else (lambda: self.streams(streams))
+		self.thread = threading.Thread(target=self.run, args=(get_streams, stop_at_end), daemon=True, name=f'source_{self.index}')
+		self.thread.start()
+
+	# engine thread, an exception is kept (see SourceManager.failed) and reported instead of silently ending the thread
+	def run(self, get_streams, stop_at_end):
+		try: self.engine.run(get_streams, stop_at_end)
+		except Exception as e:
+			self.error = e
+			print(f'Source {self.index} stopped by an error:', file=sys.stderr)
+			traceback.print_exc()
+
+	def stop(self):
+		self.engine.stopped = True
+		if self.thread is not None: self.thread.join(timeout=5)
+		self.engine.recorder = None  # shared, closed by the manager
+		self.engine.stop()
+		self.vs.stop()
+
+#---------------------------------------------------------#
+# N video sources processed in parallel: a slow camera or
+# a busy detector on one source never holds back the
+# others (each has its own capture and engine thread).
+# Udp sender and recording are shared by all sources.
+#---------------------------------------------------------#
+class SourceManager:
+
+	# ui: frontend module for the VideoStreams (see video_stream.py), engine_options: StreamEngine arguments
+	def __init__(self, ui=None, **engine_options):
+		self.ui = ui
+		self.engine_options = engine_options
+		self.sender = UdpSender()
+		self.recorder = None
+		self.sources = []
+		self.selected = 0           # source shown in the UI (preview, playback controls)
+		self.streams = None         # set by start(), sources added later start right away
+		self.stop_at_end = True
+
+	def __len__(self):
+		return len(self.sources)
+
+	def __iter__(self):
+		return iter(list(self.sources))
+
+	def __getitem__(self, index):
+		return self.sources[index]
+
+	@property
+	def current(self):
+		return self.sources[self.selected]
+
+	# new source, returns it (check source.vs.isOpened())
+	def add(self, source_type='none', source_file=0, size=1, capture_api='First available', cache_mb=512, flip=False, fps=None, loop=True):
+		vs = VideoStream(size=size, capture_api=capture_api, ui=self.ui, cache_mb=cache_mb)
+		if source_type != 'none': vs.change_source(source_type=source_type, source_file=source_file)
+		engine = StreamEngine(vs, flip=flip, sender=self.sender, **self.engine_options)
+		engine.fps_playback = fps
+		engine.loop = loop
+		engine.recorder = self.recorder
+		source = Source(len(self.sources), vs, engine)
+		self.sources.append(source)
+		if self.streams is not None: source.start(self.streams, self.stop_at_end)
+		return source
+
+	# remove the last source (stream 'source' indices stay valid), the first one is always kept
+	def remove(self):
+		if len(self.sources) <= 1: return
+		source = self.sources.pop()
+		source.stop()
+		self.selected = min(self.selected, len(self.sources)-1)
+
+	def select(self, index):
+		self.selected = max(0, min(index, len(self.sources)-1))
+		for source in self.sources: source.engine.preview = False  # frontends turn it on for the selected one
+
+	# start every source thread. streams: all streams (each source picks its own), or a function returning them
+	def start(self, streams, stop_at_end=True):
+		self.streams = streams
+		self.stop_at_end = stop_at_end
+		for source in self.sources: source.start(streams, stop_at_end)
+
+	# block until every source stopped (end of videos without loop), or one of them failed
+	def wait(self):
+		while not self.failed() and any(source.thread is not None and source.thread.is_alive() for source in self.sources): time.sleep(0.2)
+
+	# sources whose engine thread died with an exception
+	def failed(self):
+		return [source for source in self.sources if source.error is not None]
+
+	def stop(self):
+		self.stop_recording()
+		for source in self.sources: source.stop()
+		self.sender.stop()
+
+	def set_detector_processes(self, enabled):
+		for source in self.sources: source.engine.set_detector_processes(enabled)
+
+	def set_roi_tracking(self, enabled):
+		for source in self.sources: source.engine.set_roi_tracking(enabled)
+
+	# one recording for all sources (records interleave in send order)
+	def start_recording(self, path):
+		self.stop_recording()
+		self.recorder = Recorder(path)
+		for source in self.sources: source.engine.recorder = self.recorder
+
+	def stop_recording(self):
+		if self.recorder is None: return
+		for source in self.sources: source.engine.recorder = None
+		self.recorder.close()
+		self.recorder = None
+
+	# engine.stats_report() of a single source, per source reports otherwise
+	def stats_report(self):
+		if len(self.sources) == 1: return self.sources[0].engine.stats_report()
+		return {'time': time.time(), 'sources': [source.engine.stats_report() for source in self.sources]}
@@ -0,0 +1,182 @@
+import json
+import stream_types as st
+import video_protocol
+import landmark_packet
+import udp_sender
+import result_slot
+import face_subsets
+
+#---------------------------------------------------------#
+# stream definitions as plain data, shared by the UI
+# and by headless runs (json config file)
+#---------------------------------------------------------#
+
+# video source defaults
+SOURCE_DEFAULTS = {
+	'type': 'webcam',             # webcam, video, sequence or none
+	'file': 0,                    # webcam device number, video file path or image sequence (eg: plate.1001-1100#.exr)
+	'size': 1,                    # video size multiplier
+	'capture_api': 'First available',
+	'flip': False,                # flip video horizontal
+	'fps': None,                  # video playback fps (None = source fps)
+	'loop': True,                 # loop video playback
+	'cache_mb': 512,              # decoded video frames cache
+}
+
+# extra settings defaults per stream type
+STREAM_DEFAULTS = {
+	st.ST_VIDEO: {
+		'chunked': True,              # chunked video protocol (see video_protocol.py), False = single datagram per frame
+		'packetSize': video_protocol.DEFAULT_PACKET_SIZE,
+	},
+	st.ST_MP_HANDS: {
+		'applyFilter': True,
+		'smoothingFactor': 60,
+		'predict': False,             # extrapolate landmarks to compensate latency
+		'predictLatency': 0,          # ms, 0 = measured (capture -> send)
+		'predictAcceleration': False,
+		'ensureHands': False,
+		'encoding': landmark_packet.ENC_BINARY,  # Binary, Quantized or JSON (see landmark_packet.py)
+		'resultMode': result_slot.RESULT_LATEST, # Latest, Fresh only or Wait (see result_slot.py)
+		'waitMs': 20,                 # 'Wait' mode: max time waiting for the result of the last detection started
+		'rate': 0,                    # Hz, detection / send rate target, 0 = every frame (see scheduler.py)
+		'latencyBudget': 100,         # ms, capture -> result. Missed budgets slow down lower priority detectors
+		'priority': 1,                # higher priority detectors are slowed down last
+		'maxPeople': 2,               # max people (hands: max hands) sent, the detector finds as many as its most demanding stream
+		'quantRange': 10.0,           # 'Quantized' encoding: coordinates sent within +-range, in steps of range/32767. Values outside are
+		                              # clipped (counted in stats 'quantized_clipped'). Hands are camera space meters (z = distance to the camera)
+		'keyframeInterval': 1.0,      # 'Quantized' encoding: seconds between keyframes (deltas refer to the last one)
+		'changeThreshold': 0.0,       # only send when some value moved more than this since the last send (0 = every time)
+		'keepalive': 1.0,             # seconds, unchanged data is still resent this often
+	},
+	st.ST_MP_BODY: {
+		'applyFilter': False,
+		'smoothingFactor': 60,
+		'predict': False,
+		'predictLatency': 0,
+		'predictAcceleration': False,
+		'encoding': landmark_packet.ENC_BINARY,
+		'resultMode': result_slot.RESULT_LATEST,
+		'waitMs': 20,
+		'rate': 0,
+		'latencyBudget': 100,
+		'priority': 1,
+		'maxPeople': 1,
+		'quantRange': 2.0,            # meters around the hips
+		'keyframeInterval': 1.0,
+		'changeThreshold': 0.0,
+		'keepalive': 1.0,
+	},
+	st.ST_MP_FACE: {
+		'applyFilter': False,
+		'smoothingFactor': 60,
+		'predict': False,
+		'predictLatency': 0,
+		'predictAcceleration': False,
+		'encoding': landmark_packet.ENC_BINARY,
+		'resultMode': result_slot.RESULT_LATEST,
+		'waitMs': 20,
+		'rate': 0,
+		'latencyBudget': 100,
+		'priority': 1,
+		'maxPeople': 1,
+		'quantRange': 2.0,            # normalized image coordinates
+		'keyframeInterval': 1.0,
+		'changeThreshold': 0.0,
+		'keepalive': 1.0,
+		'faceLandmarks': face_subsets.FACE_ALL,  # landmarks sent: All, a subset (Lips, Eyes...), Custom ('faceIndices') or None
+		'faceIndices': '',            # 'Custom' landmark indices, eg: "0, 13, 14, 61-80" (or a list in json configs)
+		'faceBlendshapes': False,     # also send the blendshape scores (see landmark_packet.BLENDSHAPE_NAMES)
+		'faceTransform': False,       # also send the 4x4 facial transformation matrix
+	},
+	st.ST_STATS: {
+		'interval': 1.0,              # seconds between pipeline stats (json, see pipeline_stats.py)
+	},
+}
+
+# mediapipe delegates ('auto' = detectors pick, GPU on linux)
+DELEGATES = ['auto', 'cpu', 'gpu']
+
+# remap value between range
+def change_range(unscaled, from_min, from_max, to_min, to_max):
+	return (to_max-to_min)*(unscaled-from_min)/(from_max-from_min)+to_min
+
+# fill missing settings and compute derived ones
+def finalize_stream(stream):
+	stype = stream['type']
+	for k, v in STREAM_DEFAULTS.get(stype, {}).items():
+		stream.setdefault(k, v)
+
+	# extra settings calculated
+	if stype in [st.ST_MP_HANDS, st.ST_MP_BODY, st.ST_MP_FACE]:
+		stream['beta'] = change_range(stream['smoothingFactor'], 0, 100, 100, 0.5)
+
+	return stream
+
+# load a json config file, example:
+# {
+#   "source":  {"type": "webcam", "file": 0, "flip": true},
+#   (or several sources processed in parallel, streams pick one by index with "source", default 0:
+#    "sources": [{"type": "webcam", "file": 0}, {"type": "webcam", "file": 1}])
+#   "streams": [
+#     {"type": "Video", "address": "127.0.0.1", "port": 11111},
+#     {"type": "MediaPipe Hands", "address": "127.0.0.1", "port": 11112, "smoothingFactor": 60, "resultMode": "Wait", "waitMs": 15},
+#     {"type": "MediaPipe Body", "address": "10.0.0.7", "port": 11114, "encoding": "Quantized", "changeThreshold": 0.002, "keepalive": 1},
+#     {"type": "Video", "address": "10.0.0.5", "port": 11113, "sendPolicy": "Latest only"}   (optional, see udp_sender.py)
+#   ],
+#   "record": "take.vmlr",   (optional, records all outgoing payloads, see replay.py)
+#   "detector_processes": true,  (optional, run each detector in its own process)
+#   "delegate": "cpu",           (optional, mediapipe delegate: auto (GPU on linux, CPU otherwise), cpu or gpu)
+#   "roi_tracking": true,        (optional, detect on a crop around the tracked people, see roi_tracker.py)
+#   "roi_max_size": 512,         (optional, crops are downscaled to this size, 0 = never)
+#   "stats_file": "stats.json",  (optional, pipeline timings written every "stats_interval" seconds)
+#   "stats_interval": 5
+# }
+def load(path):
+	with open(path) as f: config = json.load(f)
+
+	sources = []
+	for i, source in enumerate(config.get('sources', [config.get('source', {})])):
+		source = dict(SOURCE_DEFAULTS, **source)
+		if source['type'] not in ['none', 'webcam', 'video', 'sequence']:
+			raise ValueError(f'Source {i}: unknown video source type: {source["type"]}')
+		sources.append(source)
+	if not sources: raise ValueError('No video source')
+	if config.get('delegate', 'auto') not in DELEGATES:
+		raise ValueError(f'Unknown delegate "{config["delegate"]}", expected one of {DELEGATES}')
+
+	streams = []
+	for i, stream in enumerate(config.get('streams', [])):
+		if stream.get('type') not in st.ALL:
+			raise ValueError(f'Stream {i}: unknown type "{stream.get("type")}", expected one of {st.ALL}')
+		if 'port' not in stream:
+			raise ValueError(f'Stream {i}: missing port')
+		if stream.get('encoding', landmark_packet.ENC_BINARY) not in landmark_packet.ENCODINGS:
+			raise ValueError(f'Stream {i}: unknown encoding "{stream["encoding"]}", expected one of {landmark_packet.ENCODINGS}')
+		if stream.get('sendPolicy', udp_sender.POLICY_DROP_OLDEST) not in udp_sender.POLICIES:
+			raise ValueError(f'Stream {i}: unknown send policy "{stream["sendPolicy"]}", expected one of {udp_sender.POLICIES}')
+		if stream.get('resultMode', result_slot.RESULT_LATEST) not in result_slot.RESULT_MODES:
+			raise ValueError(f'Stream {i}: unknown result mode "{stream["resultMode"]}", expected one of {result_slot.RESULT_MODES}')
+		if stream.get('faceLandmarks', face_subsets.FACE_ALL) not in face_subsets.FACE_SUBSETS:
+			raise ValueError(f'Stream {i}: unknown face landmarks "{stream["faceLandmarks"]}", expected one of {face_subsets.FACE_SUBSETS}')
+		if stream.get('faceLandmarks') == face_subsets.FACE_CUSTOM:
+			try: face_subsets.parse_indices(stream.get('faceIndices', ''))
+			except (TypeError, ValueError) as e: raise ValueError(f'Stream {i}: invalid faceIndices ({e})')
+		if float(stream.get('quantRange', 1)) <= 0:
+			raise ValueError(f'Stream {i}: quantRange must be positive')
+		if float(stream.get('keepalive', 1)) <= 0 or float(stream.get('keyframeInterval', 1)) <= 0:
+			raise ValueError(f'Stream {i}: keepalive and keyframeInterval must be positive')
+		if int(stream.get('maxPeople', 1)) < 1:
+			raise ValueError(f'Stream {i}: maxPeople must be at least 1')
+		if not 0 <= int(stream.get('source', 0)) < len(sources):
+			raise ValueError(f'Stream {i}: unknown source {stream["source"]}, {len(sources)} source(s) defined')
+		stream = dict(stream)
+		stream.setdefault('address', '127.0.0.1')
+		stream['port'] = int(stream['port'])
+		stream['source'] = int(stream.get('source', 0))
+		streams.append(finalize_stream(stream))
+
+	return {'source': sources[0], 'sources': sources, 'streams': streams, 'record': config.get('record'), 'detector_processes': bool(config.get('detector_processes', False)),
+		'delegate': config.get('delegate', 'auto'),
+		'roi_tracking': bool(config.get('roi_tracking', False)), 'roi_max_size': int(config.get('roi_max_size', 512)),
+		'stats_file': config.get('stats_file'), 'stats_interval': float(config.get('stats_interval', 5))}
@@ -0,0 +1,556 @@
+import time, json, threading, cv2, mediapipe as mp
+import numpy as np
+import process_mp_hands, process_mp_body, process_mp_face
+import stream_types as st
+import stream_config
+import video_protocol
+import landmark_packet
+from prediction import LatencyPredictor
+from one_euro_filter import OneEuroFilterBank
+from recording import Recorder
+from detector_pool import FrameRing, DetectorProcess
+from udp_sender import UdpSender
+from pipeline_stats import PipelineStats
+from result_slot import RESULT_FRESH, RESULT_WAIT
+from roi_tracker import RoiTracker, crop
+from scheduler import DetectionScheduler
+from face_subsets import subset_indices
+
+# detector class per stream type
+DETECTORS = {
+	st.ST_MP_HANDS: process_mp_hands.MediaPipe_Hands,
+	st.ST_MP_BODY:  process_mp_body.MediaPipe_Bodies,
+	st.ST_MP_FACE:  process_mp_face.MediaPipe_Faces,
+}
+
+# stream name in stats
+def stream_label(stream):
+	return f'{stream["type"]} {stream["address"]}:{stream["port"]}'
+
+# the first max_people people of a result (ordered by person id, the detector may track more for other streams)
+def first_people(result, max_people):
+	if len(result.names) <= max_people: return result
+	n = max_people
+	return result._replace(names=result.names[:n], keys=result.keys[:n], landmarks=result.landmarks[:n], velocity=result.velocity[:n], confidence=result.confidence[:n],
+		bounds=result.bounds[:n] if result.bounds is not None else None,
+		blendshapes=result.blendshapes[:n] if result.blendshapes is not None else None,
+		transforms=result.transforms[:n] if result.transforms is not None else None)
+
+# detector options needed by its streams (face: only the outputs some stream sends are computed)
+def detector_options(stype, streams):
+	if stype != st.ST_MP_FACE: return {}
+	return {'blendshapes': any(s['faceBlendshapes'] for s in streams), 'transform': any(s['faceTransform'] for s in streams)}
+
+# face outputs of a stream (landmark subset, blendshapes, transform), None for other stream types
+def face_outputs(stream):
+	if stream['type'] != st.ST_MP_FACE: return None
+	return (stream['faceLandmarks'], tuple(stream['faceIndices']) if isinstance(stream['faceIndices'], list) else stream['faceIndices'], stream['faceBlendshapes'], stream['faceTransform'])
+
+#---------------------------------------------------------#
+# per frame derivatives, each one is only built when some
+# stream (or the preview) actually asks for it
+#---------------------------------------------------------#
+class FrameProducts:
+
+	def __init__(self, frame, frame_id=0, timestamp=0.0, jpeg_quality=85, stats=None):
+		self.frame = frame  # BGR, as captured
+		self.stats = stats
+		self.frame_id = frame_id
+		self.timestamp = timestamp  # capture time
+		self.jpeg_quality = jpeg_quality
+		self._rgb = None
+		self._jpg = None
+		self._jpg_packets = {}
+		self._ring_slots = {}
+
+	# RGB frame (detectors, preview)
+	@property
+	def rgb(self):
+		if self._rgb is None: self._rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
+		return self._rgb
+
+	# RGB frame published to a shared memory ring (detector processes), returns its slot
+	def ring_slot(self, ring):
+		if ring.name not in self._ring_slots: self._ring_slots[ring.name] = ring.publish(self.frame_id, self.rgb)
+		return self._ring_slots[ring.name]
+
+	# jpg encoded bytes (video streams)
+	@property
+	def jpg(self):
+		if self._jpg is None:
+			start = time.perf_counter()
+			self._jpg = cv2.imencode('.jpg', self.frame, params=[cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])[1].tobytes()
+			if self.stats is not None: self.stats.add('jpeg', time.perf_counter()-start)
+		return self._jpg
+
+	# jpg split into chunked video protocol datagrams (video streams)
+	def jpg_packets(self, packet_size=video_protocol.DEFAULT_PACKET_SIZE):
+		if packet_size not in self._jpg_packets:
+			self._jpg_packets[packet_size] = video_protocol.packetize(self.jpg, self.frame_id, self.timestamp, packet_size)
+		return self._jpg_packets[packet_size]
+
+#---------------------------------------------------------#
+# streaming pipeline: reads frames from a VideoStream,
+# runs detections and sends data to each stream.
+# Has no UI dependency, frontends (DPG or headless)
+# just feed it a stream list on every step. Several
+# engines (one per video source, see source_manager.py)
+# can run in parallel, sharing one udp sender.
+#---------------------------------------------------------#
+class StreamEngine:
+
+	# delegate: mediapipe tasks.BaseOptions.Delegate for all detectors, None = platform default
+	# roi_tracking: detectors only see a crop around the people found in their last result (see roi_tracker.py)
+	# sender: shared UdpSender (multiple sources), None = own sender, stopped with the engine
+	def __init__(self, vs, flip=False, draw_overlay=True, preview=True, detector_processes=False, delegate=None, roi_tracking=False, roi_max_size=512, sender=None):
+		self.vs = vs
+		self.flip = flip
+		self.draw_overlay = draw_overlay
+		self.preview = preview             # build display_image for frontends
+		self.display_image = None
+		self.stopped = False
+
+		# held while a frame is processed, settings changed from other threads (UI) wait for the frame to finish
+		self.lock = threading.Lock()
+
+		# udp sends happen on the sender thread, slow receivers never stall the pipeline
+		self.own_sender = sender is None
+		self.sender = UdpSender() if sender is None else sender
+		self.frame_id = 0
+
+		# video playback
+		self.playing = True
+		self.loop = True
+		self.fps_playback = None           # None = source fps
+		self.video_last_time = time.time()
+
+		# detectors (created on first use), optionally each one in its own process
+		self.detectors = {}
+		self.detector_processes = detector_processes
+		self.delegate = delegate
+		self.frame_ring = None             # shared memory frames for detector processes
+
+		# region of interest tracking, per detector
+		self.roi_tracking = roi_tracking
+		self.roi_max_size = roi_max_size   # crops are downscaled to this size (long side, pixels), 0 = never
+		self.roi_trackers = {}             # detector type -> RoiTracker
+
+		# per destination post-processing, shared by streams with the same settings
+		self.filters = {}                  # (type, beta) -> [filter bank, iteration, last input result, last output result, last capture time, detection interval]
+		self.predictors = {}               # (type, beta, acceleration) -> latency predictor
+		self.face_indices = {}             # face_outputs() -> landmark indices sent (None = all)
+		self.quantizers = {}               # stream index -> QuantizedEncoder ('Quantized' encoding keyframes)
+		self.change_gates = {}             # stream index -> ChangeGate (unchanged data is not resent, see 'changeThreshold')
+
+		# records every outgoing payload when set (see recording.py)
+		self.recorder = None
+
+		# last mediapipe timestamp per detector (ms, must increase on every detection)
+		self.detector_ts = {}
+
+		# which detectors run on each frame, per stream rates (see scheduler.py)
+		self.scheduler = DetectionScheduler()
+
+		# last valid (filtered) result per stream (resent while nothing is detected)
+		self.streams = None                # stream list of the last frame (a new list resets per stream state)
+		self.data_last = {}
+
+		# frame id of the last result consumed per stream ('Fresh only' streams skip results already sent)
+		self.result_sent = {}
+
+		# per stage timings (see pipeline_stats.py)
+		self.stats = PipelineStats()
+		self.stats_results = {}            # detector type -> last result seen (new results add detector timings)
+		self.stats_sent = {}               # stats stream index -> last send time
+
+		# FPS calc init
+		self.fps = 30.0
+		self.fps_start_time = time.time()
+		self.fps_counter = 0
+		self.fps_update_rate_sec = 1 # update fps at every 1 second
+
+	# get (or create) the detector for a stream type, recreated when max_people (None = keep it, stream default when created)
+	# or its options (see detector_options) change
+	def get_detector(self, stype, max_people=None, **options):
+		detector = self.detectors.get(stype)
+		if detector is not None and ((max_people is not None and detector.max_people != max_people) or any(getattr(detector, k) != v for k, v in options.items())):
+			detector.close()
+			self.roi_trackers.pop(stype, None)
+			detector = None
+		if detector is None:
+			if max_people is None: max_people = stream_config.STREAM_DEFAULTS[stype]['maxPeople']
+			if self.detector_processes:
+				detector = DetectorProcess(stype, self.vs.width, self.vs.height, self.delegate, max_people, **options)
+			else:
+				detector = DETECTORS[stype](self.vs.width, self.vs.height, delegate=self.delegate, max_people=max_people, **options)
+				detector.draw_skeleton = detector.draw_skeleton and self.draw_overlay
+			self.detectors[stype] = detector
+		return detector
+
+	# switch between in-process detectors and one process per detector
+	def set_detector_processes(self, enabled):
+		if enabled == self.detector_processes: return
+		with self.lock:
+			self.close_detectors()
+			self.detector_processes = enabled
+
+	# detectors on a crop around the tracked people (or always on the full frame)
+	def set_roi_tracking(self, enabled):
+		with self.lock:
+			self.roi_tracking = enabled
+			self.roi_trackers = {}
+
+	def close_detectors(self):
+		for detector in self.detectors.values(): detector.close()
+		self.detectors = {}
+		self.roi_trackers = {}
+		if self.frame_ring is not None:
+			self.frame_ring.close()
+			self.frame_ring = None
+
+	# hand a frame (or a crop of it, roi: normalized x0, y0, x1, y1) to a detector and start detection
+	def start_detection(self, detector, timestamp, products, roi=None):
+		if isinstance(detector, DetectorProcess):
+			if self.frame_ring is None or self.frame_ring.shape != products.rgb.shape:
+				if self.frame_ring is not None: self.frame_ring.close()
+				self.frame_ring = FrameRing(products.rgb.shape)
+			detector.detect(self.frame_ring, products.ring_slot(self.frame_ring), products.frame_id, timestamp, products.timestamp, roi, self.roi_max_size)
+		else:
+			image, roi = crop(products.rgb, roi, self.roi_max_size)
+			detector.image = mp.Image(mp.ImageFormat.SRGB, data=image)
+			detector.detect(timestamp, products.timestamp, products.frame_id, roi, products.rgb if roi is not None and detector.draw_skeleton else None)
+
+	# crop for the next detection of a detector (None = full frame)
+	def detector_roi(self, stype, detector):
+		if not self.roi_tracking: return None
+		tracker = self.roi_trackers.get(stype)
+		if tracker is None: tracker = self.roi_trackers[stype] = RoiTracker()
+		tracker.update(detector.result, self.vs.width, self.vs.height, detector.max_people)
+		return tracker.roi
+
+	# mediapipe timestamp (ms) of a frame: its capture time on the monotonic clock, strictly increasing per detector
+	def detector_timestamp(self, stype, products):
+		timestamp = int((time.monotonic() - max(0.0, time.time()-products.timestamp))*1000)
+		timestamp = max(timestamp, self.detector_ts.get(stype, -1)+1)
+		self.detector_ts[stype] = timestamp
+		return timestamp
+
+	# create all detectors upfront (avoids a hitch when the first stream is added)
+	def init_detectors(self):
+		for stype in DETECTORS.keys(): self.get_detector(stype)
+
+	# seconds between video frames at current playback speed
+	def playback_period(self):
+		fps = self.fps_playback if self.fps_playback else self.vs.source_fps
+		if not fps or fps<=0: fps = 30
+		return 1/float(fps)
+
+	# if playing video, increment frame. Returns True if frame changed
+	def advance_playback(self):
+		vs = self.vs
+		if not vs.has_frames() or not self.playing: return False
+		if time.time()-self.video_last_time < self.playback_period(): return False
+
+		vs.set_counter = True
+		vs.frameNumber += 1  # increment
+		if vs.frameNumber >= vs.frames-1:
+			if self.loop: vs.frameNumber = vs.frameNumber%(vs.frames-1)  # loop
+			else:
+				vs.frameNumber = vs.frames-1
+				self.playing = False
+		self.video_last_time = time.time()
+		return True
+
+	# read a frame, process all streams. Returns False if no frame is available
+	def step(self, streams):
+		with self.lock: return self._step(streams)
+
+	def _step(self, streams):
+		with self.stats.time('read'): success, frame = self.vs.read()
+		if not success: return False
+		if streams is not self.streams:
+			self.streams_changed()
+			self.streams = streams
+		self.stats.add('capture to process', max(0.0, time.time()-self.vs.frame_time))
+
+		# flip image?
+		if self.flip:
+			with self.stats.time('flip'): frame = cv2.flip(frame, 1)
+
+		self.frame_id += 1
+		start = time.perf_counter()
+		self.scheduler.frame_started(start)
+		self.display_image = self.process_frame(frame, streams)
+		duration = time.perf_counter()-start
+		self.stats.add('frame', duration)
+		self.scheduler.frame_done(duration)
+
+		# FPS calc
+		self.fps_counter+=1
+		if (time.time() - self.fps_start_time) > self.fps_update_rate_sec:
+			self.fps = self.fps_counter / (time.time() - self.fps_start_time)
+			self.fps_counter = 0
+			self.fps_start_time = time.time()
+
+		return True
+
+	# engine loop (headless, or a source thread): process frames as fast as the source provides them
+	# streams: stream list, or a function returning the current one. stop_at_end: stop when video playback ends
+	def run(self, streams, stop_at_end=True):
+		last_frame_id = self.vs.frame_id
+		while not self.stopped:
+
+			# pace video files to playback fps
+			if self.vs.has_frames():
+				time.sleep(max(0, self.video_last_time + self.playback_period() - time.time()))
+				if not self.advance_playback() and not self.playing and stop_at_end:
+					self.stopped = True
+					break
+
+			# wait for a new frame from the capture thread
+			frame_id = self.vs.wait_frame(last_frame_id, timeout=0.1 if self.vs.has_frames() else 1.0)  # paused videos: notice play soon
+			if frame_id == last_frame_id: continue
+			last_frame_id = frame_id
+
+			self.step(streams() if callable(streams) else streams)
+
+	def stop(self):
+		self.stopped = True
+		with self.lock:
+			self.stop_recording()
+			self.close_detectors()
+		if self.own_sender: self.sender.stop()
+
+	# stream list changed (added / removed / edited, step() gets a new list): per stream state is indexed by position, drop it
+	def streams_changed(self):
+		self.data_last = {}
+		self.result_sent = {}
+		self.quantizers = {}
+		self.change_gates = {}
+		self.scheduler.streams_changed()
+
+	def start_recording(self, path):
+		self.stop_recording()
+		self.recorder = Recorder(path)
+
+	def stop_recording(self):
+		if self.recorder is None: return
+		self.recorder.close()
+		self.recorder = None
+
+	# queue a payload (or a list of datagrams sent / dropped together) to a stream, and record it
+	def send(self, stream, payload, products):
+		self.sender.send((stream['address'], stream['port']), payload, stream.get('sendPolicy'))
+		if self.recorder is not None:
+			for datagram in (payload if isinstance(payload, list) else [payload]): self.recorder.write(stream, datagram, products.timestamp, products.frame_id)
+
+	# run every detector used by some stream (at most once per frame, when the scheduler says it is due)
+	def run_detectors(self, streams, products):
+		now = time.perf_counter()
+		self.scheduler.configure(streams, DETECTORS.keys())
+		for stype in DETECTORS.keys():
+			users = [stream for stream in streams if stream['type'] == stype]
+			if not users: continue
+			detector = self.get_detector(stype, max(stream['maxPeople'] for stream in users), **detector_options(stype, users))  # most people any stream wants
+			if not self.scheduler.due(stype, detector.result, now): continue
+			detector.apply_filter = False  # filtering is per destination, see filter_result
+			with self.stats.time(f'detect submit {stype}'): self.start_detection(detector, self.detector_timestamp(stype, products), products, self.detector_roi(stype, detector))
+			self.scheduler.submitted(stype, products.frame_id, now)
+		self.scheduler.adjust(now)
+
+	# timings of detection results that arrived since the last frame
+	def collect_detector_stats(self):
+		for stype, detector in self.detectors.items():
+			result = detector.result
+			if result is self.stats_results.get(stype) or result.capture_time <= 0: continue
+			self.stats_results[stype] = result
+			latency = max(0.0, time.time()-result.capture_time)
+			self.stats.add(f'detector {stype}', detector.callback_time)
+			self.stats.add(f'latency {stype}', latency)
+			self.scheduler.result(stype, latency, time.perf_counter())
+
+	# scheduled and achieved detection / send rates (see scheduler.py)
+	def rates_report(self):
+		return self.scheduler.report({stream_label(s): s for s in (self.scheduler.streams or ()) if s['type'] in DETECTORS})
+
+	# pipeline timings, fps and sender counters (stats panel, stats streams, json dumps)
+	def stats_report(self):
+		return {
+			'time': time.time(),
+			'fps': round(self.fps, 2),
+			'capture_fps': round(self.vs.fps, 2),
+			'stages': self.stats.summary(),
+			'destinations': self.sender.stats(),
+			'roi': {stype: tracker.roi for stype, tracker in self.roi_trackers.items()},
+			'rates': self.rates_report(),
+			'quantized_clipped': {stream_label(self.streams[i]): encoder.clipped for i, encoder in list(self.quantizers.items()) if self.streams is not None and i < len(self.streams)},
+		}
+
+	# one-euro filtered result for a stream, computed once per detection and filter strength
+	# its velocity is the derivative (dx_hat) of that filter, so the prediction follows the stream's motion filter
+	def filter_result(self, stream, result):
+		if not stream['applyFilter']: return result
+		key = (stream['type'], stream['beta'])
+		state = self.filters.get(key)
+		if state is None: state = self.filters[key] = [OneEuroFilterBank(min_cutoff=0.004, beta=stream['beta']), 0, None, None, 0.0, 1/30]  # same min cutoff as the detectors
+		if state[2] is not result:
+			bank = state[0]
+			state[1] += 1
+			state[2] = result
+
+			# seconds between detections (the filter runs once per detection, its derivative is per detection)
+			dt = result.capture_time - state[4]
+			if 0 < dt < 1: state[5] = 0.8*state[5] + 0.2*dt
+			state[4] = result.capture_time
+
+			landmarks = bank(state[1], result.keys, result.landmarks)
+			velocity = (bank.derivative(result.keys)/state[5]).astype(np.float32) if len(result.keys) else result.velocity
+			state[3] = result._replace(landmarks=landmarks, velocity=velocity)
+		return state[3]
+
+	# data a stream sends from a detection result (latency prediction, face subset): landmarks, blendshapes, transforms, age
+	def stream_output(self, stream, result):
+		landmarks = result.landmarks
+		age = time.time()-result.capture_time if result.capture_time > 0 else 0.0  # capture -> send
+
+		# extrapolate forward by the configured latency (or measured capture -> send time). Velocity comes from the
+		# stream's motion filter (see filter_result), or from the detector filter when the stream has none
+		if stream['predict']:
+			latency = stream['predictLatency']/1000 if stream['predictLatency']>0 else age
+			key = (stream['type'], stream['beta'] if stream['applyFilter'] else None, stream['predictAcceleration'])
+			if key not in self.predictors: self.predictors[key] = LatencyPredictor(acceleration=stream['predictAcceleration'])
+			landmarks = self.predictors[key](result.keys, landmarks, result.velocity, result.confidence, latency, result.capture_time)
+
+		# face: landmark subset, optional blendshapes / transform
+		blendshapes = transforms = None
+		outputs = face_outputs(stream)
+		if outputs is not None:
+			if outputs not in self.face_indices: self.face_indices[outputs] = subset_indices(stream['faceLandmarks'], stream['faceIndices'])
+			indices = self.face_indices[outputs]
+			if indices is not None: landmarks = landmarks[:, indices]
+			if stream['faceBlendshapes']: blendshapes = result.blendshapes
+			if stream['faceTransform']: transforms = result.transforms
+		return landmarks, blendshapes, transforms, age
+
+	# serialize a stream output with the stream encoding (quantized: keyframe state of stream i)
+	def encode_landmarks(self, i, stream, result, output, products):
+		landmarks, blendshapes, transforms, age = output
+		if stream['encoding'] == landmark_packet.ENC_JSON: return landmark_packet.encode_json(result.names, landmarks, blendshapes, transforms)
+		frame_id = result.frame_id if result.frame_id >= 0 else products.frame_id
+		if stream['encoding'] == landmark_packet.ENC_QUANTIZED:
+			encoder = self.quantizers.get(i)
+			if encoder is None: encoder = self.quantizers[i] = landmark_packet.QuantizedEncoder(stream['quantRange'], stream['keyframeInterval'])
+			return encoder.encode(stream['type'], frame_id, result.capture_time, result.names, landmarks, age, blendshapes, transforms)
+		return landmark_packet.encode(stream['type'], frame_id, result.capture_time, result.names, landmarks, age, blendshapes, transforms)
+
+	# settings (and detected frame) that make a stream payload different, streams with the same key share one payload per frame
+	def payload_key(self, stream, result):
+		return (
+			stream['type'],
+			result.frame_id,
+			stream['beta'] if stream['applyFilter'] else None,
+			(stream['predictLatency'], stream['predictAcceleration']) if stream['predict'] else None,
+			stream['encoding'],
+			stream['maxPeople'],
+			face_outputs(stream),
+		)
+
+	# send data to all streams for a single frame, returns the image to display (RGB, or None if preview is off)
+	def process_frame(self, frame, streams):
+		vs = self.vs
+		data_last = self.data_last
+
+		# frame products (jpg / rgb) are built lazily by the streams that need them
+		products = FrameProducts(frame, self.frame_id, vs.frame_time, stats=self.stats)
+		display_image = products.rgb if self.preview else None
+
+		# detection runs (at most) once per frame, no matter how many streams use it
+		self.collect_detector_stats()
+		self.run_detectors(streams, products)
+		now = time.perf_counter()
+		outputs = {}   # payload key -> stream output (predicted landmarks, face extras)
+		payloads = {}  # payload key -> encoded landmarks (quantized: per stream)
+
+		# loop through streams
+		for i, stream in enumerate(streams):
+
+			# INFO DICT
+			if stream['type'] == st.ST_INFO_DICT:
+				if 'info' not in payloads:
+					info = {}
+					info['image_width']  = vs.width
+					info['image_height'] = vs.height
+					info['source_type']  = vs.source_type
+					info['source_file']  = vs.source_file
+					if vs.has_frames():
+						info['num_frames']  = vs.frames
+						info['curr_frame']  = vs.frameNumber
+						info['source_fps']  = vs.source_fps
+					info['streams'] = [
+							{
+								'type':    s['type'],
+								'address': s['address'],
+								'port':    s['port'],
+							}
+							for s in streams
+						]
+					payloads['info'] = json.dumps(info).encode()
+				self.send(stream, payloads['info'], products)
+
+			# VIDEO
+			if stream['type'] == st.ST_VIDEO:
+				packets = products.jpg_packets(stream['packetSize']) if stream['chunked'] else products.jpg
+				with self.stats.time(f'send {stream_label(stream)}'): self.send(stream, packets, products)
+
+			# STATS (json, every 'interval' seconds)
+			if stream['type'] == st.ST_STATS:
+				if time.time()-self.stats_sent.get(i, 0) >= stream['interval']:
+					self.stats_sent[i] = time.time()
+					self.send(stream, json.dumps(self.stats_report()).encode(), products)
+
+			# MEDIAPIPE (HANDS, BODY, FACE)
+			if stream['type'] in DETECTORS:
+				detector = self.get_detector(stream['type'])
+
+				# stream rate: at most 'rate' sends per second (0 = every frame)
+				if not self.scheduler.stream_due(i, stream['rate'], now): continue
+
+				# latest result, or the result of the last detection started (waiting up to 'waitMs' for it)
+				if stream['resultMode'] == RESULT_WAIT:
+					with self.stats.time(f'wait {stream["type"]}'): result = detector.results.wait(self.scheduler.last_submitted(stream['type']), stream['waitMs']/1000)
+				else: result = detector.result
+
+				# fresh only: every detection is sent once
+				if stream['resultMode'] == RESULT_FRESH and self.result_sent.get(i) == result.frame_id: continue
+				self.result_sent[i] = result.frame_id
+
+				# hands: optionally wait for both hands, body: at least one body, face: always send
+				if stream['type'] == st.ST_MP_HANDS: found = len(set(result.names)) >= (int(stream['ensureHands'])+1 if 'ensureHands' in stream.keys() else 1)
+				elif stream['type'] == st.ST_MP_BODY: found = len(result.names) > 0
+				else: found = True
+
+				# send data (the last valid result is re-encoded, so the packet age stays true)
+				if found:
+					if self.preview and result.display_image is not None: display_image = result.display_image
+					with self.stats.time(f'filter {stream_label(stream)}'): data_last[i] = first_people(self.filter_result(stream, result), stream['maxPeople'])
+				if i in data_last:
+					data = data_last[i]
+					key = self.payload_key(stream, data)
+					if key not in outputs:
+						with self.stats.time(f'output {stream_label(stream)}'): outputs[key] = self.stream_output(stream, data)
+					output = outputs[key]
+
+					# change suppression: data that didn't move is only resent every 'keepalive' seconds
+					values = tuple(v for v in output[:3] if v is not None)
+					gate = self.change_gates.get(i)
+					if gate is None: gate = self.change_gates[i] = landmark_packet.ChangeGate()
+					if not gate.due(data.names, values, stream['changeThreshold'], stream['keepalive'], now): continue
+
+					if stream['encoding'] == landmark_packet.ENC_QUANTIZED: key = (key, i)
+					if key not in payloads:
+						with self.stats.time(f'serialize {stream_label(stream)}'): payloads[key] = self.encode_landmarks(i, stream, data, output, products)
+					with self.stats.time(f'send {stream_label(stream)}'): self.send(stream, payloads[key], products)
+					gate.sent(data.names, values, now)
+					self.scheduler.stream_sent(i, stream_label(stream), stream['rate'], now)
+
+		return display_image
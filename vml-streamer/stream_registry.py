@@ -0,0 +1,69 @@
+import threading
+from types import MappingProxyType
+import stream_types as st
+import stream_config
+
+#---------------------------------------------------------#
+# stream list as plain data. Frontends edit it from their
+# callbacks (add / delete / widget changes), the streaming
+# loop only reads snapshot(): an immutable tuple, rebuilt
+# once per change instead of on every frame.
+#---------------------------------------------------------#
+class StreamRegistry:
+
+	def __init__(self):
+		self.streams = {}     # stream id -> {'type', 'address', 'port', 'source', 'settings': {type: {name: value}}}
+		self.next_id = 0
+		self.lock = threading.Lock()
+		self._snapshot = ()
+
+	def __len__(self):
+		return len(self.streams)
+
+	# new stream, returns its id (stable, unlike the stream's position in the list)
+	# source: index of the video source it reads (see source_manager.py)
+	def add(self, stype=st.ALL[0], address='127.0.0.1', port=11111, source=0):
+		with self.lock:
+			stream_id = self.next_id
+			self.next_id += 1
+			self.streams[stream_id] = {
+				'type': stype,
+				'address': address,
+				'port': int(port),
+				'source': int(source),
+				'settings': {t: dict(defaults) for t, defaults in stream_config.STREAM_DEFAULTS.items()},
+			}
+		self.changed()
+		return stream_id
+
+	def remove(self, stream_id):
+		with self.lock:
+			if self.streams.pop(stream_id, None) is None: return
+		self.changed()
+
+	# change a stream field (type, address, port, source) or an extra setting of one stream type
+	def update(self, stream_id, key, value, stype=None):
+		with self.lock:
+			stream = self.streams.get(stream_id)
+			if stream is None: return
+			if stype is None: stream[key] = int(value) if key in ('port', 'source') else value
+			else: stream['settings'].setdefault(stype, {})[key] = value
+		self.changed()
+
+	# next free port (after the highest one in use)
+	def next_port(self, first=11111):
+		return max([first-1] + [s['port'] for s in self.streams.values()]) + 1
+
+	# rebuild the snapshot after a change
+	def changed(self):
+		with self.lock:
+			streams = []
+			for stream in self.streams.values():
+				s = {'type': stream['type'], 'address': stream['address'], 'port': stream['port'], 'source': stream['source']}
+				s.update(stream['settings'].get(stream['type'], {}))
+				streams.append(MappingProxyType(stream_config.finalize_stream(s)))
+			self._snapshot = tuple(streams)
+
+	# immutable stream list, same format as stream_config.load()['streams']
+	def snapshot(self):
+		return self._snapshot
@@ -3,5 +3,6 @@ ST_VIDEO     = 'Video'
 ST_MP_HANDS  = 'MediaPipe Hands'
 ST_MP_BODY   = 'MediaPipe Body'
 ST_MP_FACE   = 'MediaPipe Face'
+ST_STATS     = 'Stats'
 
 ALL          = [v for k,v in globals().items() if k.startswith('ST_')]
\ No newline at end of file
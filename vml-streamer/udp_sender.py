@@ -0,0 +1,117 @@
+import socket, threading
+from collections import deque
+
+# what happens to queued data when a destination can't keep up
+POLICY_DROP_OLDEST = 'Drop oldest'  # bounded queue, oldest messages are dropped when full
+POLICY_LATEST_ONLY = 'Latest only'  # only the newest message is kept (stale frames are useless)
+POLICIES = [POLICY_DROP_OLDEST, POLICY_LATEST_ONLY]
+
+#---------------------------------------------------------#
+# queue and counters of a single destination (address, port).
+# A message is a list of datagrams that belong together
+# (eg: all chunks of one video frame) and is only ever
+# dropped as a whole.
+#---------------------------------------------------------#
+class Destination:
+
+	def __init__(self, addr_port, policy=POLICY_DROP_OLDEST, max_queue=64):
+		self.addr_port = addr_port
+		self.policy = policy
+		self.messages = deque()
+		self.max_queue = max_queue  # messages
+		self.queued = 0             # datagrams waiting
+		self.sent = 0
+		self.dropped = 0
+		self.errors = 0
+		self.last_error = None
+
+	def put(self, datagrams):
+		limit = 1 if self.policy == POLICY_LATEST_ONLY else self.max_queue
+		while len(self.messages) >= limit:
+			dropped = self.messages.popleft()
+			self.queued -= len(dropped)
+			self.dropped += len(dropped)
+		self.messages.append(datagrams)
+		self.queued += len(datagrams)
+
+	def stats(self):
+		return {'queued': self.queued, 'sent': self.sent, 'dropped': self.dropped, 'errors': self.errors, 'policy': self.policy}
+
+#---------------------------------------------------------#
+# sends udp datagrams on a dedicated thread, so slow or
+# unreachable receivers never block capture / detection.
+# send() only appends to a per destination queue; the
+# thread wakes up, takes everything queued and sends it
+# in one batch.
+#---------------------------------------------------------#
+class UdpSender:
+
+	def __init__(self, policy=POLICY_DROP_OLDEST, max_queue=64, send_buffer=4*1024*1024):
+		self.policy = policy          # default policy for new destinations
+		self.max_queue = max_queue
+		self.destinations = {}        # (address, port) -> Destination
+		self.pending = False
+		self.stopped = False
+		self.cond = threading.Condition()
+
+		# big send buffer so chunked video frames go out in one burst
+		self.skt = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+		try: self.skt.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+		except OSError: pass
+
+		self.t = threading.Thread(target=self.update, args=(), daemon=True, name='udp_sender')
+		self.t.start()
+
+	# queue one datagram (bytes) or a message (list of datagrams) for addr_port
+	def send(self, addr_port, datagrams, policy=None):
+		if isinstance(datagrams, (bytes, bytearray, memoryview)): datagrams = [datagrams]
+		with self.cond:
+			dest = self.destinations.get(addr_port)
+			if dest is None: dest = self.destinations[addr_port] = Destination(addr_port, self.policy, self.max_queue)
+			if policy is not None: dest.policy = policy
+			dest.put(datagrams)
+			self.pending = True
+			self.cond.notify()
+
+	def update(self):
+		while True:
+			with self.cond:
+				self.cond.wait_for(lambda: self.pending or self.stopped)
+				if self.stopped: break
+
+				# take everything queued (one lock acquisition per batch)
+				batch = []
+				for dest in self.destinations.values():
+					while dest.messages:
+						datagrams = dest.messages.popleft()
+						dest.queued -= len(datagrams)
+						batch.append((dest, datagrams))
+				self.pending = False
+
+			# send outside the lock, producers keep queueing meanwhile
+			for dest, datagrams in batch:
+				for datagram in datagrams:
+					try:
+						self.skt.sendto(datagram, dest.addr_port)
+						dest.sent += 1
+					except OSError as e:  # unreachable host, icmp port unreachable, buffer full...
+						dest.errors += 1
+						dest.last_error = str(e)
+
+	# change the policy of every destination (and of new ones)
+	def set_policy(self, policy):
+		with self.cond:
+			self.policy = policy
+			for dest in self.destinations.values(): dest.policy = policy
+
+	# per destination counters, {'address:port': {...}}
+	def stats(self):
+		with self.cond:
+			return {f'{a}:{p}': dest.stats() for (a, p), dest in self.destinations.items()}
+
+	def stop(self):
+		with self.cond:
+			self.stopped = True
+			self.cond.notify()
+		self.t.join(timeout=1)
+		self.skt.close()
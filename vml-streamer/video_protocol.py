@@ -0,0 +1,144 @@
+import struct, socket, sys, time
+
+#---------------------------------------------------------#
+# Chunked video protocol (udp)
+#
+# Each jpg frame is split into datagrams that fit the
+# network MTU (no IP fragmentation). Every datagram is:
+#
+#   header (big endian, 25 bytes):
+#     magic        4s   b'VMLV'
+#     version      B
+#     frame_id     I    increments per sent frame (wraps at 2^32)
+#     chunk_index  H
+#     chunk_count  H
+#     timestamp    d    capture time (seconds since epoch)
+#     frame_size   I    total jpg size in bytes
+#   payload:       jpg bytes [chunk_index*chunk_size : ...]
+#
+# Receivers should use FrameReassembler (below), it drops
+# incomplete frames instead of waiting for lost datagrams.
+#---------------------------------------------------------#
+
+MAGIC   = b'VMLV'
+VERSION = 1
+HEADER  = struct.Struct('!4sBIHHdI')
+
+# 1500 (ethernet MTU) - 20 (IPv4 header) - 8 (UDP header)
+DEFAULT_PACKET_SIZE = 1472
+MAX_CHUNKS = 0xFFFF
+
+# split a frame into datagrams
+def packetize(data, frame_id, timestamp, packet_size=DEFAULT_PACKET_SIZE):
+	chunk_size = packet_size - HEADER.size
+	if chunk_size <= 0: raise ValueError(f'Packet size must be bigger than header size ({HEADER.size} bytes)')
+	chunk_count = max(1, -(-len(data)//chunk_size))
+	if chunk_count > MAX_CHUNKS: raise ValueError(f'Frame too big ({len(data)} bytes) for packet size {packet_size}')
+
+	frame_id = frame_id & 0xFFFFFFFF
+	view = memoryview(data)
+	packets = []
+	for i in range(chunk_count):
+		header = HEADER.pack(MAGIC, VERSION, frame_id, i, chunk_count, timestamp, len(data))
+		packets.append(header + view[i*chunk_size:(i+1)*chunk_size])
+	return packets
+
+# parse a datagram header, returns (frame_id, chunk_index, chunk_count, timestamp, frame_size, payload) or None
+def parse_packet(packet):
+	if len(packet) < HEADER.size: return None
+	magic, version, frame_id, chunk_index, chunk_count, timestamp, frame_size = HEADER.unpack_from(packet)
+	if magic != MAGIC or version != VERSION or chunk_index >= chunk_count: return None
+	return frame_id, chunk_index, chunk_count, timestamp, frame_size, memoryview(packet)[HEADER.size:]
+
+#---------------------------------------------------------#
+# rebuilds frames from datagrams. Only the most recent
+# frames are kept pending, anything older than the last
+# completed frame is dropped (never stalls on packet loss).
+# A sender restart (ids start over) resyncs right away
+# when the id jumps back more than resync_gap frames, or
+# after resync_after older frames in a row otherwise.
+#---------------------------------------------------------#
+class FrameReassembler:
+
+	def __init__(self, max_pending=4, resync_gap=64, resync_after=8):
+		self.max_pending = max_pending
+		self.resync_gap = resync_gap
+		self.resync_after = resync_after
+		self.pending = {}          # frame_id -> [timestamp, frame_size, chunks, received]
+		self.last_frame_id = None  # last completed frame
+		self.stale_frame_id = None # last frame id seen older than last_frame_id
+		self.stale_frames = 0      # older frames in a row
+		self.frames_completed = 0
+		self.frames_dropped = 0
+
+	# is frame_id older than (or equal to) reference, accounting for wrap around
+	@staticmethod
+	def is_older(frame_id, reference):
+		return ((reference - frame_id) & 0xFFFFFFFF) < 0x80000000
+
+	# start over from the next datagram (sender restarted)
+	def resync(self):
+		self.frames_dropped += len(self.pending)
+		self.pending = {}
+		self.last_frame_id = None
+		self.stale_frame_id = None
+		self.stale_frames = 0
+
+	# feed a datagram, returns (frame_id, timestamp, frame_bytes) when a frame is complete, None otherwise
+	def feed(self, packet):
+		parsed = parse_packet(packet)
+		if parsed is None: return None
+		frame_id, chunk_index, chunk_count, timestamp, frame_size, payload = parsed
+
+		# late datagram from an already completed (or skipped) frame, unless the sender restarted
+		if self.last_frame_id is not None and self.is_older(frame_id, self.last_frame_id):
+			if frame_id != self.stale_frame_id:
+				self.stale_frame_id = frame_id
+				self.stale_frames += 1
+			if (self.last_frame_id - frame_id) & 0xFFFFFFFF <= self.resync_gap and self.stale_frames < self.resync_after: return None
+			self.resync()
+		else: self.stale_frames = 0
+
+		entry = self.pending.get(frame_id)
+		if entry is None:
+			entry = [timestamp, frame_size, [None]*chunk_count, 0]
+			self.pending[frame_id] = entry
+
+			# too many frames in flight, drop the oldest ones
+			while len(self.pending) > self.max_pending:
+				oldest = max(self.pending.keys(), key=lambda f: (frame_id - f) & 0xFFFFFFFF)
+				del self.pending[oldest]
+				self.frames_dropped += 1
+
+		chunks = entry[2]
+		if chunk_index >= len(chunks) or chunks[chunk_index] is not None: return None
+		chunks[chunk_index] = bytes(payload)
+		entry[3] += 1
+		if entry[3] < len(chunks): return None
+
+		# frame complete: drop it and every older pending frame
+		del self.pending[frame_id]
+		for f in [f for f in self.pending.keys() if self.is_older(f, frame_id)]:
+			del self.pending[f]
+			self.frames_dropped += 1
+		self.last_frame_id = frame_id
+		self.frames_completed += 1
+
+		data = b''.join(chunks)
+		if len(data) != entry[1]: return None
+		return frame_id, entry[0], data
+
+# reference receiver: python video_protocol.py [port] [address]
+if __name__ == '__main__':
+	port = int(sys.argv[1]) if len(sys.argv)>1 else 11111
+	address = sys.argv[2] if len(sys.argv)>2 else '0.0.0.0'
+	skt = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+	skt.bind((address, port))
+	reassembler = FrameReassembler()
+	start_time = time.time()
+	while True:
+		ret = reassembler.feed(skt.recv(65535))
+		if ret and time.time()-start_time > 1:
+			frame_id, timestamp, data = ret
+			print(f'frame {frame_id}: {len(data)} bytes, latency {(time.time()-timestamp)*1000:.1f}ms, completed {reassembler.frames_completed}, dropped {reassembler.frames_dropped}')
+			start_time = time.time()
@@ -0,0 +1,168 @@
+import os, time, cv2, bisect
+from collections import OrderedDict
+from threading import Thread, get_native_id
+
+#---------------------------------------------------------#
+# LRU cache of decoded frames, bounded by a memory budget
+#---------------------------------------------------------#
+class FrameCache:
+
+	def __init__(self, budget_mb=512):
+		self.budget = int(budget_mb*1024*1024)
+		self.frames = OrderedDict()  # frame index -> frame
+		self.nbytes = 0
+		self.hits = 0
+		self.misses = 0
+
+	def __contains__(self, index):
+		return index in self.frames
+
+	# frame at index (counts as a hit / miss), or None
+	def get(self, index):
+		frame = self.frames.get(index)
+		if frame is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.frames.move_to_end(index)
+		return frame
+
+	def put(self, index, frame):
+		if index in self.frames: self.nbytes -= self.frames.pop(index).nbytes
+		self.frames[index] = frame
+		self.nbytes += frame.nbytes
+
+		# evict least recently used frames
+		while self.nbytes > self.budget and len(self.frames) > 1:
+			self.nbytes -= self.frames.popitem(last=False)[1].nbytes
+
+	def clear(self):
+		self.frames.clear()
+		self.nbytes = 0
+
+	@property
+	def hit_rate(self):
+		total = self.hits + self.misses
+		return self.hits/total if total else 0.0
+
+#---------------------------------------------------------#
+# scans a video file in the background (second capture)
+# and records which packets are keyframes. The capture is
+# in raw mode (CAP_PROP_FORMAT -1): grab() only demuxes,
+# nothing is decoded, so the scan costs next to no cpu
+# next to playback and detectors. Needs the FFmpeg
+# backend, otherwise the index stays empty and seeks fall
+# back to the fixed backfill (see VideoReader)
+#---------------------------------------------------------#
+class KeyframeIndex:
+
+	def __init__(self, path, yield_every=256):
+		self.path = path
+		self.yield_every = yield_every  # packets between short sleeps (playback keeps the GIL)
+		self.keyframes = []
+		self.scanned = 0       # frames scanned so far
+		self.done = False
+		self.stopped = False
+		self.supported = hasattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME')
+		self.t = Thread(target=self.update, args=(), daemon=True)
+		self.t.start()
+
+	def update(self):
+		# lowest scheduling priority for this thread (linux: per thread nice value)
+		try: os.setpriority(os.PRIO_PROCESS, get_native_id(), 19)
+		except (AttributeError, OSError): pass
+
+		capture = cv2.VideoCapture(self.path, cv2.CAP_FFMPEG) if self.supported else None
+		if capture is None or not capture.isOpened() or not capture.set(cv2.CAP_PROP_FORMAT, -1):
+			self.supported = False
+		else:
+			while not self.stopped and capture.grab():
+				if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME): self.keyframes.append(self.scanned)
+				self.scanned += 1
+				if self.scanned % self.yield_every == 0: time.sleep(0.001)
+		if capture is not None: capture.release()
+		self.done = not self.stopped
+
+	# closest keyframe at or before index, None if unknown
+	def keyframe_before(self, index):
+		if index >= self.scanned: return None
+		i = bisect.bisect_right(self.keyframes, index)
+		return self.keyframes[i-1] if i else None
+
+	def stop(self):
+		self.stopped = True
+
+#---------------------------------------------------------#
+# sequential video decoder: decoded frames go to an LRU
+# cache, playback decodes forward (read ahead of the
+# playhead) and only seeks when the requested frame is
+# not cached. Seeks start at the previous keyframe (when
+# indexed), so every frame decoded on the way is cached
+# and stepping back and forth near the playhead is instant
+#---------------------------------------------------------#
+class VideoReader:
+
+	def __init__(self, path, api=cv2.CAP_ANY, cache_mb=512, read_ahead=8, max_skip=15, backfill=8, max_backfill=120):
+		self.capture = cv2.VideoCapture(path, api)
+		self.cache = FrameCache(cache_mb)
+		self.keyframes = KeyframeIndex(path)
+		self.read_ahead = read_ahead      # frames decoded ahead of the playhead
+		self.max_skip = max_skip          # decode forward (instead of seeking) up to this many frames
+		self.backfill = backfill          # frames decoded before a seek target when no keyframe is known
+		self.max_backfill = max_backfill  # never decode more than this many frames before a seek target
+		self.next_index = 0               # index of the frame capture.read() returns next
+		self.eof = False
+
+	def isOpened(self):
+		return self.capture.isOpened()
+
+	def release(self):
+		self.keyframes.stop()
+		self.cache.clear()
+		self.capture.release()
+
+	def get(self, prop):
+		return self.capture.get(prop)
+
+	# decode the next frame into the cache, False at end of file
+	def decode_next(self):
+		grabbed, frame = self.capture.read()
+		if not grabbed:
+			self.eof = True
+			return False
+		self.cache.put(self.next_index, frame)
+		self.next_index += 1
+		return True
+
+	# first frame to decode when seeking to index
+	def seek_start(self, index):
+		keyframe = self.keyframes.keyframe_before(index)
+		if keyframe is not None and index-keyframe <= self.max_backfill: return keyframe
+		return max(0, index-self.backfill)
+
+	def seek(self, index):
+		self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+		self.next_index = index
+		self.eof = False
+
+	# frame at index (BGR), same return as cv2.VideoCapture.read()
+	def read(self, index):
+		index = int(index)
+		frame = self.cache.get(index)
+		if frame is None:
+			if self.eof or not (self.next_index <= index <= self.next_index + self.max_skip): self.seek(self.seek_start(index))
+			while self.next_index <= index:
+				if not self.decode_next(): break
+			frame = self.cache.frames.get(index)
+		return frame is not None, frame
+
+	# decode one more frame ahead of index, False when there is nothing to do (read-ahead full or end of file)
+	def prefetch(self, index):
+		if self.eof or not (index < self.next_index <= index + self.read_ahead): return False
+		return self.decode_next()
+
+	# short cache / index stats for the UI
+	def info(self):
+		txt = f'cache {self.cache.nbytes/(1024*1024):.0f}MB, {self.cache.hit_rate*100:.0f}% hits'
+		if self.keyframes.supported: txt += f', {len(self.keyframes.keyframes)} keyframes' if self.keyframes.done else ', indexing...'
+		return txt
@@ -1,31 +1,61 @@
 import cv2, platform, time, numpy as np
-import dearpygui.dearpygui as dpg
-from threading import Thread
-import dpg_callback
+from threading import Thread, Condition
+from sequence_reader import SequenceReader, is_sequence_path
+from video_reader import VideoReader
+
+# opencv capture apis by display name
+CAPTURE_APIS = {
+	'First available': cv2.CAP_ANY,
+	'Direct Show': cv2.CAP_DSHOW,
+	'V4L2': cv2.CAP_V4L2,
+}
 
 class VideoStream:
 
-	def __init__(self, size=1):
+	# ui: optional frontend module (eg: dpg_callback) providing get_video_size(), 
+	# get_capture_api() and video_source_changed(vs). Leave as None to run headless.
+	def __init__(self, size=1, capture_api='First available', ui=None, cache_mb=512):
 		self.stream = None
+		self.t = None
+		self.warmup_timeout = 3.0  # seconds waiting for the first webcam frame
 		self.set_counter = False
+		self.size = size
+		self.capture_api = capture_api
+		self.cache_mb = cache_mb  # decoded video frames cache (scrubbing)
+		self.ui = ui
+		self.frame_id = 0
+		self.frame_time = time.time()
+		self.frame_ready = Condition()
+		self.frame_request = Condition()
+		self._frameNumber = 0
 		self.change_source(source_type='none')
 		#self.change_source(source_type='webcam', source_file=0, size=size)
 		
 	def get_capture_api(self):
-		chosen_api = dpg.get_value('cv_vid_cap_api')
-		apis = {
-			'First available': cv2.CAP_ANY,
-			'Direct Show': cv2.CAP_DSHOW,
-			'V4L2': cv2.CAP_V4L2,
-		}
-
-		try: ret_api = apis[chosen_api]
+		chosen_api = self.ui.get_capture_api() if self.ui else self.capture_api
+
+		try: ret_api = CAPTURE_APIS[chosen_api]
 		except: ret_api = cv2.CAP_ANY
 
 		return ret_api
 
+	# requested frame (video / image sequence), wakes up the capture thread when changed
+	@property
+	def frameNumber(self):
+		return self._frameNumber
+
+	@frameNumber.setter
+	def frameNumber(self, value):
+		with self.frame_request:
+			self._frameNumber = value
+			self.frame_request.notify_all()
+
+	# frame based sources (playback controls, seeking)
+	def has_frames(self):
+		return self.source_type in ['video', 'sequence']
+
 	def start(self):
-		if self.source_type != 'none': 
+		if self.source_type != 'none' and self.stream.isOpened():
 			self.t = Thread(target=self.update, args=())
 			self.t.start()
 		return self
@@ -34,6 +64,7 @@ class VideoStream:
 		start_time = time.time()
 		counter = 0
 		fps_update_rate_sec = 1
+		decoded_frame = None
 
 		while True:
 
@@ -42,12 +73,32 @@ class VideoStream:
 				if self.stream: self.stream.release()
 				return
 
-			# set video frame
-			if self.source_type=='video': self.stream.set(cv2.CAP_PROP_POS_FRAMES, int(self.frameNumber))
-			
-			# read image
-			try: (self.grabbed, self.frame) = self.stream.read()
-			except: self.grabbed=False
+			# video / image sequence: only decode when frame changes, readers buffer the next frames
+			if self.has_frames():
+				frame_number = int(self.frameNumber)
+				if frame_number == decoded_frame:
+
+					# read ahead, block when buffer is full (or paused) until another frame is requested
+					if not self.stream.prefetch(frame_number):
+						with self.frame_request:
+							self.frame_request.wait_for(lambda: int(self._frameNumber)!=frame_number or self.stopped, timeout=0.5)
+					continue
+
+				try: (self.grabbed, self.frame) = self.stream.read(frame_number)
+				except: self.grabbed=False
+				decoded_frame = frame_number
+
+			# webcam
+			else:
+				try: (self.grabbed, self.frame) = self.stream.read()
+				except: self.grabbed=False
+
+			# notify consumers waiting for a new frame
+			if self.grabbed:
+				with self.frame_ready:
+					self.frame_id += 1
+					self.frame_time = time.time()
+					self.frame_ready.notify_all()
 
 			# calc fps
 			if self.source_type=='webcam':
@@ -73,14 +124,30 @@ class VideoStream:
 			except: 
 				pass
 		else:
-			ret = (True, np.zeros((self.width, self.height)))
+			ret = (True, np.zeros((self.height, self.width, 3), dtype=np.uint8))
 
 		return ret
+
+	# source stats for the UI (decoded frames cache, keyframe index)
+	def info(self):
+		if self.source_type=='video' and self.stream: return self.stream.info()
+		return ''
+
+	# block until a frame newer than last_frame_id is grabbed (or timeout), returns the current frame id
+	def wait_frame(self, last_frame_id, timeout=1.0):
+		if self.source_type == 'none':
+			time.sleep(timeout)
+			return self.frame_id
+		with self.frame_ready:
+			self.frame_ready.wait_for(lambda: self.frame_id > last_frame_id or self.stopped, timeout=timeout)
+			return self.frame_id
 	
 	def stop(self):
 		if self.source_type != 'none':
-			self.stopped = True
-			self.t.join(timeout=5)
+			with self.frame_request:
+				self.stopped = True
+				self.frame_request.notify_all()
+			if self.t is not None: self.t.join(timeout=5)
 			self.stream=None
 			self.t=None
 		else:
@@ -93,7 +160,7 @@ class VideoStream:
 
 		return isOpened
 
-	def change_source(self, source_type='webcam', source_file=0, size=1):
+	def change_source(self, source_type='webcam', source_file=0, size=None):
 		if self.stream is not None and self.stream.isOpened(): self.stop()
 
 		self.source_type = source_type
@@ -101,7 +168,8 @@ class VideoStream:
 		self.frames = 0
 		self.frameNumber  = 0
 		self.source_fps = 0
-		self.size = self.size = float(dpg.get_value('video_size')) if dpg.does_alias_exist('video_size') else size	
+		if size is None: size = self.size
+		self.size = self.ui.get_video_size(size) if self.ui else size
 		vcap_api = self.get_capture_api()
 
 		# generates an empty (black) video frame
@@ -112,64 +180,54 @@ class VideoStream:
 			self.width  = int(self.capture_width*self.size)
 			self.height = int(self.capture_height*self.size)
 
-			if dpg.does_alias_exist('playback_controls'): dpg.hide_item('playback_controls')
-			if dpg.does_alias_exist('camera_controls'): dpg.show_item('camera_controls')
-
-			if dpg.does_alias_exist('video_image'): dpg.hide_item('video_image')
-			if dpg.does_alias_exist('video_image_empty'): dpg.show_item('video_image_empty')
-
 		# read webcam
 		elif self.source_type=='webcam':
 			self.stream = cv2.VideoCapture(int(source_file), vcap_api)
 
-			# grab single frame to read webcam resolution
-			success = False
-			while not success: 
+			# grab single frame to read webcam resolution (cameras may need a few reads to warm up, give up after a while)
+			success, info_frame = False, None
+			deadline = time.time() + self.warmup_timeout
+			while self.stream.isOpened() and not success and time.time() < deadline:
 				success, info_frame = self.stream.read()
+				if not success: time.sleep(0.05)
+
+			# missing / busy camera: released, isOpened() reports it (no capture thread)
+			if not success:
+				self.stream.release()
+				info_frame = np.zeros((240, 320, 3), dtype=np.uint8)
 
 			self.capture_width  = info_frame.shape[1]
 			self.capture_height = info_frame.shape[0]
 			self.width  = int(self.capture_width*self.size)
 			self.height = int(self.capture_height*self.size)
 			
-			if dpg.does_alias_exist('playback_controls'): dpg.hide_item('playback_controls')
-			if dpg.does_alias_exist('camera_controls'): dpg.show_item('camera_controls')
-
-			if dpg.does_alias_exist('video_image'): dpg.show_item('video_image')
-			if dpg.does_alias_exist('video_image_empty'): dpg.hide_item('video_image_empty')
-			
 		# read video file
 		elif self.source_type=='video':
-			self.stream = cv2.VideoCapture(source_file, vcap_api)
+			self.stream = VideoReader(source_file, vcap_api, cache_mb=self.cache_mb)
 			self.frames = self.stream.get(cv2.CAP_PROP_FRAME_COUNT)
 			self.source_fps = self.stream.get(cv2.CAP_PROP_FPS)
 			if self.source_fps <=0: self.source_fps = 24
-			if dpg.does_alias_exist('fps_playback'): dpg.set_value('fps_playback', int(self.source_fps))
 
 			self.capture_width  = self.stream.get(cv2.CAP_PROP_FRAME_WIDTH)
 			self.capture_height = self.stream.get(cv2.CAP_PROP_FRAME_HEIGHT)
 			self.width = int(self.capture_width*self.size)
 			self.height =int(self.capture_height*self.size)
 
-			if dpg.does_alias_exist('cv_frame'): 
-				dpg.configure_item('cv_frame', width=self.width, height=self.height)
-				dpg.configure_item('video_frame', max_value=int(self.frames-1))
+		# read image sequence (exr/png/jpg...), decoded on a thread pool
+		elif self.source_type=='sequence':
+			self.stream = SequenceReader(source_file)
+			self.frames = self.stream.frames
+			self.source_fps = 24
 
-			if dpg.does_alias_exist('playback_controls'): dpg.show_item('playback_controls')
-			if dpg.does_alias_exist('camera_controls'): dpg.hide_item('camera_controls')
-			if dpg.does_alias_exist('webcam_device_number'): dpg.set_value('webcam_device_number', 'None')
-
-			if dpg.does_alias_exist('video_image'): dpg.show_item('video_image')
-			if dpg.does_alias_exist('video_image_empty'): dpg.hide_item('video_image_empty')
-
-		dpg_callback.recreate_raw_texture(self.width, self.height)
-		dpg_callback.resize_viewport(self.width)
+			success, info_frame = self.stream.read(0)
+			if not success: info_frame = np.zeros((240, 320, 3), dtype=np.uint8)
+			self.capture_width  = info_frame.shape[1]
+			self.capture_height = info_frame.shape[0]
+			self.width  = int(self.capture_width*self.size)
+			self.height = int(self.capture_height*self.size)
 
-		if self.source_type=='none':
-			if dpg.does_alias_exist('video_image'): dpg.hide_item('video_image')
-			if dpg.does_alias_exist('video_image_empty'): dpg.show_item('video_image_empty')
-			dpg.set_viewport_width(450)
-			dpg.set_viewport_height(720)
+		# update frontend widgets (if any)
+		if self.ui: self.ui.video_source_changed(self)
 
 		self.stopped = False
 		self.fps = 0
@@ -179,5 +237,6 @@ class VideoStream:
 	def load_video_file(self, filename_list, cancel_pressed):
 		if len(filename_list) and not cancel_pressed:
 			# change to none, then to file... this is to avoid dpg crashes
+			source_type = 'sequence' if is_sequence_path(filename_list[0]) else 'video'
 			self.change_source(source_type='none')
-			self.change_source(source_type='video', source_file=filename_list[0])
+			self.change_source(source_type=source_type, source_file=filename_list[0])